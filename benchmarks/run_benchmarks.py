@@ -0,0 +1,207 @@
+"""
+Offline ETL benchmarks.
+
+Runs each stage and the whole `main()` against a local Zoho stub, moto (S3, SNS, SSM, Secrets
+Manager, CloudWatch) and a local mongod or mongomock, at one or more lead counts. Every size runs in
+its own process so peak RSS is measured per size.
+
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 1000000 --output results.json
+    python benchmarks/run_benchmarks.py --sizes 10000 --baseline results.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "src")
+RESULT_PREFIX = "BENCHMARK_RESULT "
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Zoho to DocumentDB ETL offline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Lead counts to benchmark")
+    parser.add_argument("--mode", default="batch", choices=["batch", "resumable", "streaming"], help="main() mode")
+    parser.add_argument("--page-latency", type=float, default=0.0, help="Seconds the Zoho stub waits per page")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every n-th page request with 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--mongo-uri", help="Local mongod to load into; mongomock is used when omitted")
+    parser.add_argument("--skip-stages", action="store_true", help="Only benchmark main(), not each stage alone")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+# moto 5 has one mock for every service, moto 4 one per service
+def start_aws_mocks():
+    try:
+        from moto import mock_aws
+        mocks = [mock_aws()]
+    except ImportError:
+        from moto import mock_cloudwatch, mock_s3, mock_secretsmanager, mock_sns, mock_ssm
+        mocks = [mock_s3(), mock_sns(), mock_ssm(), mock_secretsmanager(), mock_cloudwatch()]
+    for mock in mocks:
+        mock.start()
+    return mocks
+
+# Create the bucket, secrets and parameters the ETL reads
+def seed_aws(constants):
+    import boto3
+    region = constants.REGION_NAME
+    boto3.client("s3", region_name=region).create_bucket(
+        Bucket=constants.S3_BUCKET_NAME, CreateBucketConfiguration={"LocationConstraint": region}
+    )
+    secrets = boto3.client("secretsmanager", region_name=region)
+    secrets.create_secret(Name=constants.ZOHO_CRM_CREDENTIAL, SecretString=json.dumps({
+        constants.ZOHO_REFRESH_TOKEN: "stub-refresh-token",
+        constants.ZOHO_CLIENT_ID: "stub-client-id",
+        constants.ZOHO_SECRET: "stub-client-secret"
+    }))
+    secrets.create_secret(Name=constants.SECRET_NAME, SecretString=json.dumps({
+        "username": "benchmark", "password": "benchmark", "host": "localhost", "port": "27017"
+    }))
+    topic_arn = boto3.client("sns", region_name=region).create_topic(Name="etl-benchmark")["TopicArn"]
+    boto3.client("ssm", region_name="ap-southeast-2").put_parameter(Name="sns_topic_arn", Value=topic_arn, Type="String")
+
+# Point the shared DocumentDB client at a local mongod or an in-memory mongomock client
+def connect_local_mongo(mongo_uri):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return lambda **pool_options: MongoClient(mongo_uri, **pool_options)
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("Install mongomock (pip install -r benchmarks/requirements.txt) or pass --mongo-uri.")
+    client = mongomock.MongoClient()
+    return lambda **pool_options: client
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def timed(results, name, record_count, function, *args, **kwargs):
+    started = time.perf_counter()
+    value = function(*args, **kwargs)
+    seconds = time.perf_counter() - started
+    results[name] = {
+        "seconds": round(seconds, 3),
+        "records_per_sec": round(record_count / seconds, 1) if seconds else None,
+        "peak_rss_mb": peak_rss_mb()
+    }
+    return value
+
+# Benchmark one lead count; runs in a child process
+def run_single(size, args):
+    os.environ.update({"AWS_ACCESS_KEY_ID": "benchmark", "AWS_SECRET_ACCESS_KEY": "benchmark", "AWS_SESSION_TOKEN": "benchmark"})
+    sys.path.insert(0, SRC_DIR)
+    sys.path.insert(0, BENCHMARK_DIR)
+    mocks = start_aws_mocks()
+
+    # AWS clients are built lazily on first use; the ETL is still imported once moto is active so nothing reaches AWS
+    import constants
+    os.environ.setdefault("AWS_DEFAULT_REGION", constants.REGION_NAME)
+    seed_aws(constants)
+    import etl
+    import url_builders
+    import utils
+    from mongo_pool import MongoClientManager
+    from zoho_stub import ZohoStubServer
+
+    stub = ZohoStubServer(size, page_latency=args.page_latency, rate_limit_every=args.rate_limit_every,
+                          retry_after=args.retry_after).start()
+    etl.ZOHO_BASE_URL = url_builders.ZOHO_BASE_URL = stub.leads_url
+    utils.mongo_client_manager = MongoClientManager(connect_local_mongo(args.mongo_uri))
+    leads_collection = utils.get_leads_collection()
+    leads_collection.delete_many({})
+
+    result = {"size": size, "mode": args.mode, "stages": {}}
+    try:
+        if not args.skip_stages:
+            leads = timed(result["stages"], "Extraction", size, etl.fetch_leads, size)
+            timed(result["stages"], "Incremental Load", size, etl.incremental_load, leads)
+            manifest = timed(result["stages"], "Backup", size, utils.backup_mongo_data_to_s3)
+            timed(result["stages"], "Validation", size, utils.validate_data, zoho_records=leads, mongo_manifest=manifest)
+            del leads
+            leads_collection.delete_many({})
+
+        main_result = {}
+        timed(main_result, "main", size, etl.main, mode=args.mode, max_records=size)
+        result["main"] = dict(main_result["main"], stages_ms=utils.tracer.report()["stages_ms"])
+        result["peak_rss_mb"] = peak_rss_mb()
+        result["rate_limited_requests"] = stub.rate_limited
+    finally:
+        # Ship queued logs and metrics while moto is still intercepting the calls
+        utils.flush_metrics()
+        utils.flush_logs()
+        stub.stop()
+        utils.mongo_client_manager.close()
+        for mock in mocks:
+            mock.stop()
+    return result
+
+def run_size(size, argv):
+    command = [sys.executable, os.path.abspath(__file__), "--single", str(size)] + argv
+    completed = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+    lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if completed.returncode != 0 or not lines:
+        print(completed.stdout[-4000:])
+        raise RuntimeError(f"Benchmark for {size} leads failed with exit code {completed.returncode}")
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+def change(current, baseline):
+    if not baseline:
+        return ""
+    return f" ({(current - baseline) / baseline:+.1%})"
+
+def print_report(results, baseline=None):
+    baseline_by_size = {result["size"]: result for result in (baseline or {}).get("results", [])}
+    for result in results:
+        previous = baseline_by_size.get(result["size"], {})
+        print(f"\n{result['size']:,} leads ({result['mode']} mode), peak RSS {result['peak_rss_mb']} MB, "
+              f"{result['rate_limited_requests']} rate-limited requests")
+        rows = [(name, stage, previous.get("stages", {}).get(name, {})) for name, stage in result["stages"].items()]
+        rows.append(("main()", result["main"], previous.get("main", {})))
+        for name, stage, before in rows:
+            print(f"  {name:<18} {stage['seconds']:>10.3f} s{change(stage['seconds'], before.get('seconds')):<10} "
+                  f"{stage['records_per_sec'] or 0:>12,.0f} records/s {stage['peak_rss_mb']:>10} MB")
+        for name, milliseconds in result["main"]["stages_ms"].items():
+            before = previous.get("main", {}).get("stages_ms", {}).get(name)
+            print(f"    main / {name:<22} {milliseconds / 1000:>10.3f} s{change(milliseconds, before)}")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.single:
+        print(RESULT_PREFIX + json.dumps(run_single(args.single, args)))
+        return
+
+    child_argv = [
+        "--mode", args.mode,
+        "--page-latency", str(args.page_latency),
+        "--rate-limit-every", str(args.rate_limit_every),
+        "--retry-after", str(args.retry_after)
+    ]
+    if args.mongo_uri:
+        child_argv += ["--mongo-uri", args.mongo_uri]
+    if args.skip_stages:
+        child_argv.append("--skip-stages")
+    results = [run_size(size, child_argv) for size in args.sizes]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"created_at": str(datetime.now()), "results": results}, output_file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
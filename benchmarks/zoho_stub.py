@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Deterministic lead for a 0-based position, shaped like a Zoho Leads API record
+def make_lead(position):
+    modified = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=position)
+    return {
+        "id": str(4000000000000 + position),
+        "First_Name": f"First{position}",
+        "Last_Name": f"Last{position}",
+        "Email": f"lead{position}@example.com",
+        "Phone": f"+61 4{position:08d}",
+        "Company": f"Company {position % 1000}",
+        "Industry": ("Retail", "Finance", "Health", "Education")[position % 4],
+        "Lead_Status": ("Not Contacted", "Contacted", "Qualified")[position % 3],
+        "Modified_Time": modified.isoformat()
+    }
+
+class ZohoStubServer:
+    """
+    Local stand-in for the Zoho Leads and OAuth token endpoints.
+
+    GET <any path> answers with page `page` of `record_count` generated leads (`per_page` each) and
+    204 past the last page. POST .../oauth/v2/token issues a stub access token. Every page request
+    waits `page_latency` seconds, and every `rate_limit_every`-th page request is answered with
+    429 and a `Retry-After` of `retry_after` seconds instead.
+
+    Parameters:
+        record_count (int): Leads served in total.
+        page_latency (float): Seconds added to every page request.
+        rate_limit_every (int): Answer every n-th page request with 429; 0 disables it.
+        retry_after (int): Retry-After seconds sent with a 429.
+        port (int): Port to listen on; 0 picks a free one.
+    """
+
+    def __init__(self, record_count, page_latency=0.0, rate_limit_every=0, retry_after=0, port=0):
+        self.record_count = record_count
+        self.page_latency = page_latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.page_requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def leads_url(self):
+        return f"{self.url}/crm/v2/Leads"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="zoho-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _next_request_is_limited(self):
+        with self._lock:
+            self.page_requests += 1
+            limited = self.rate_limit_every and self.page_requests % self.rate_limit_every == 0
+            if limited:
+                self.rate_limited += 1
+            return limited
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=None, headers=None):
+                payload = json.dumps(body).encode("utf-8") if body is not None else b""
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                if urlparse(self.path).path.endswith("/oauth/v2/token"):
+                    self._send(200, {"access_token": "stub-access-token", "expires_in": 3600})
+                else:
+                    self._send(404, {"code": "INVALID_URL_PATTERN"})
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                page = int(query.get("page", ["1"])[0])
+                per_page = int(query.get("per_page", ["200"])[0])
+                if stub.page_latency:
+                    time.sleep(stub.page_latency)
+                if stub._next_request_is_limited():
+                    self._send(429, {"code": "TOO_MANY_REQUESTS"}, {"Retry-After": str(stub.retry_after)})
+                    return
+
+                start = (page - 1) * per_page
+                end = min(start + per_page, stub.record_count)
+                if start >= end:
+                    self._send(204)
+                    return
+                self._send(200, {
+                    "data": [make_lead(position) for position in range(start, end)],
+                    "info": {"page": page, "per_page": per_page, "count": end - start, "more_records": end < stub.record_count}
+                })
+
+        return Handler
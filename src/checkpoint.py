@@ -0,0 +1,111 @@
+import json
+from datetime import datetime
+from config import s3_client
+from constants import S3_BUCKET_NAME, CHECKPOINT_MAX_AGE_SECONDS
+
+class ExtractionCheckpoint:
+    """
+    Durable record of the Zoho pages an extraction has already fetched.
+
+    Each committed batch of pages is written as its own object under the staging prefix, and the
+    manifest is rewritten only after that part is stored, so the manifest never points at a
+    missing part. A restarted run reads the manifest and continues from the page after
+    `last_page`.
+
+    Zoho pages are offsets into a list that keeps changing, so only a recent, unfinished checkpoint
+    of the same extraction is resumed. Checkpoints older than `max_age` seconds, ones staged for
+    other extraction parameters and finished ones that were never cleared (e.g. because the load
+    failed) are deleted and the extraction starts again from page 1.
+
+    Parameters:
+        prefix (str): S3 prefix for the staged parts and the manifest.
+        bucket (str): S3 bucket name.
+        client: S3 client, defaults to the shared one.
+        max_age (int): Seconds after its start at which a checkpoint is no longer resumed.
+    """
+
+    def __init__(self, prefix, bucket=S3_BUCKET_NAME, client=None, max_age=CHECKPOINT_MAX_AGE_SECONDS):
+        self.client = client or s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_age = max_age
+        self.manifest_key = f"{prefix}manifest.json"
+        self.manifest = None
+
+    def load(self, modified_since=None, max_records=None):
+        """Returns the stored manifest when it can be resumed, otherwise a fresh one."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.manifest_key)
+            self.manifest = json.loads(response['Body'].read().decode('utf-8'))
+        except self.client.exceptions.NoSuchKey:
+            self.manifest = None
+
+        if self.manifest is not None:
+            reason = self._discard_reason(self.manifest, modified_since, max_records)
+            if reason:
+                print(f"Discarding extraction checkpoint {self.manifest_key}: {reason}.")
+                self.clear()
+
+        if self.manifest is None:
+            self.manifest = {
+                "modified_since": modified_since,
+                "max_records": max_records,
+                "started_at": str(datetime.now()),
+                "last_page": 0,
+                "record_count": 0,
+                "parts": [],
+                "complete": False
+            }
+        return self.manifest
+
+    def _discard_reason(self, manifest, modified_since, max_records):
+        if manifest.get("complete"):
+            return "the extraction finished but its data was never cleared after loading"
+        if manifest.get("modified_since") != modified_since or manifest.get("max_records") != max_records:
+            return "it was staged for a different extraction"
+        started_at = manifest.get("started_at") or manifest.get("updated_at")
+        if started_at is None:
+            return "it has no start time"
+        age = (datetime.now() - datetime.fromisoformat(started_at)).total_seconds()
+        if age > self.max_age:
+            return f"it is {int(age)} seconds old"
+        return None
+
+    def commit_part(self, first_page, last_page, records):
+        """Stores the records of pages first_page..last_page and then advances the manifest."""
+        part_key = f"{self.prefix}part-{first_page:05d}.json"
+        self.client.put_object(Bucket=self.bucket, Key=part_key, Body=json.dumps(records))
+        self.manifest["parts"].append({
+            "key": part_key,
+            "first_page": first_page,
+            "last_page": last_page,
+            "record_count": len(records)
+        })
+        self.manifest["last_page"] = last_page
+        self.manifest["record_count"] += len(records)
+        self._save_manifest()
+
+    def mark_complete(self):
+        self.manifest["complete"] = True
+        self._save_manifest()
+
+    def _save_manifest(self):
+        self.manifest["updated_at"] = str(datetime.now())
+        self.client.put_object(Bucket=self.bucket, Key=self.manifest_key, Body=json.dumps(self.manifest))
+
+    def iter_parts(self):
+        """Yields the staged records part by part, in page order."""
+        for part in self.manifest["parts"]:
+            response = self.client.get_object(Bucket=self.bucket, Key=part["key"])
+            yield json.loads(response['Body'].read().decode('utf-8'))
+
+    def clear(self):
+        """Deletes the staged parts and the manifest once their data has been loaded."""
+        manifest = self.manifest or self.load()
+        keys = [part["key"] for part in manifest["parts"]] + [self.manifest_key]
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]], "Quiet": True}
+            )
+        self.manifest = None
@@ -0,0 +1,81 @@
+import time
+from constants import NUM_FETCH_DATA, ETL_MODES
+# Importing the ETL here keeps the DocumentDB pool, AWS clients, Zoho access token, cached secrets
+# and the CA bundle path in module scope, so warm invocations reuse them instead of rebuilding them
+from etl import main
+from utils import get_mongo_pool_stats
+from zoho_modules import ZOHO_MODULES
+
+SUPPORTED_MODULES = tuple(ZOHO_MODULES)
+
+_container_started = time.time()
+_invocation_count = 0
+
+# Event values arrive as JSON booleans from SDK calls and as strings from some schedulers
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+# Read the run options from the invocation event
+def parse_event(event):
+    """
+    Parameters:
+        event (dict): Invocation event. Recognised keys are `max_records` (or `record_limit`),
+            `module` or a `modules` list, `mode`, `incremental` and `profile`; all are optional.
+
+    Returns:
+        dict: Keyword arguments for etl.main.
+    """
+    event = event or {}
+    modules = event.get("modules", [event.get("module", "Leads")])
+    if isinstance(modules, str):
+        modules = [module.strip() for module in modules.split(",") if module.strip()]
+    options = {
+        "max_records": int(event.get("max_records", event.get("record_limit", NUM_FETCH_DATA))),
+        "modules": list(modules),
+        "mode": event.get("mode", "batch"),
+        "incremental": _as_bool(event.get("incremental", False)),
+        "profile": _as_bool(event["profile"]) if "profile" in event else None
+    }
+    if options["max_records"] <= 0:
+        raise ValueError("max_records must be a positive number of records")
+    if options["mode"] not in ETL_MODES:
+        raise ValueError(f"Unknown mode {options['mode']!r}; expected one of {', '.join(ETL_MODES)}")
+    if not options["modules"]:
+        raise ValueError("At least one Zoho module must be given")
+    for module in options["modules"]:
+        if module not in SUPPORTED_MODULES:
+            raise ValueError(f"Unsupported Zoho module {module!r}; expected one of {', '.join(SUPPORTED_MODULES)}")
+    return options
+
+# AWS Lambda entry point
+def lambda_handler(event, context):
+    """
+    Runs one ETL from a Lambda invocation and returns its summary.
+
+    Errors are raised so Lambda marks the invocation as failed and its retry and alarm settings apply.
+    """
+    global _invocation_count
+    _invocation_count += 1
+    cold_start = _invocation_count == 1
+
+    try:
+        options = parse_event(event)
+    except (TypeError, ValueError) as e:
+        print(f"Rejected invocation event {event!r}: {e}")
+        raise
+
+    run_id = getattr(context, "aws_request_id", None)
+    print(f"Starting {options['mode']} ETL for Zoho {', '.join(options['modules'])} ({'cold' if cold_start else 'warm'} start).")
+    summary = main(run_id=run_id, **options)
+
+    return dict(
+        summary,
+        module=", ".join(options["modules"]),
+        cold_start=cold_start,
+        invocation_count=_invocation_count,
+        container_age_seconds=round(time.time() - _container_started, 1),
+        mongo_pool=get_mongo_pool_stats(),
+        remaining_time_ms=context.get_remaining_time_in_millis() if context is not None else None
+    )
@@ -0,0 +1,141 @@
+import atexit
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from constants import LOG_FLUSH_ENTRIES, LOG_FLUSH_BYTES, LOG_FLUSH_INTERVAL, LOG_QUEUE_SIZE
+from s3_key_builders import build_log_batch_key
+
+# Run IDs sort by start time and stay unique across concurrent runs
+def new_run_id():
+    return f"{datetime.now().strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+class S3LogShipper:
+    """
+    Buffers log entries and ships them to S3 from a background thread.
+
+    Entries are written as NDJSON objects keyed `logs/<date>/<run_id>/<sequence>.ndjson`, so every
+    entry of a run is kept. `<date>` is the run's start, so a run crossing midnight keeps one prefix. A batch is shipped once it holds `max_entries` entries or `max_bytes`
+    bytes, once its oldest entry has waited `flush_interval` seconds, on `flush()`, and at process
+    exit. `emit()` never blocks: when the queue is full the entry is dropped and counted.
+
+    Parameters:
+        bucket (str): S3 bucket receiving the logs.
+        client: S3 client used for the uploads.
+        run_id (str): ID grouping this run's logs, generated when not given.
+        started_at (datetime): Start of the run, dating its keys; now when not given.
+        max_entries (int): Entries per shipped object.
+        max_bytes (int): Bytes per shipped object.
+        flush_interval (float): Seconds an entry may wait before it is shipped.
+        max_queue (int): Entries buffered before new ones are dropped.
+    """
+
+    def __init__(self, bucket, client, run_id=None, started_at=None, max_entries=LOG_FLUSH_ENTRIES, max_bytes=LOG_FLUSH_BYTES,
+                 flush_interval=LOG_FLUSH_INTERVAL, max_queue=LOG_QUEUE_SIZE):
+        self.bucket = bucket
+        self.client = client
+        self.run_id = run_id or new_run_id()
+        self.started_at = started_at or datetime.now()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._sequence = 0
+
+    def emit(self, entry):
+        """
+        Queues one log entry. Returns False when the entry had to be dropped.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(("entry", entry))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=30):
+        """
+        Ships everything queued so far and waits up to `timeout` seconds for the upload.
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def start_run(self, run_id=None, started_at=None):
+        """
+        Ships the previous run's entries and starts a new run ID, e.g. per warm Lambda invocation.
+        `started_at` dates every key of the new run; now when not given.
+        """
+        self.flush()
+        with self._lock:
+            self.run_id = run_id or new_run_id()
+            self.started_at = started_at or datetime.now()
+            self._sequence = 0
+        return self.run_id
+
+    def close(self, timeout=30):
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(("close", done))
+        done.wait(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="s3-log-shipper", daemon=True)
+                thread.start()
+                self._thread = thread
+                atexit.register(self.close)
+
+    def _run(self):
+        lines, size, oldest = [], 0, None
+        while True:
+            timeout = None if oldest is None else max(0, oldest + self.flush_interval - time.monotonic())
+            try:
+                kind, item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, item = "flush", None
+
+            if kind == "entry":
+                line = json.dumps(item, default=str) + "\n"
+                lines.append(line)
+                size += len(line)
+                oldest = oldest or time.monotonic()
+                if len(lines) < self.max_entries and size < self.max_bytes:
+                    continue
+
+            if lines:
+                self._ship(lines)
+                lines, size, oldest = [], 0, None
+            if kind in ("flush", "close") and item is not None:
+                item.set()
+            if kind == "close":
+                with self._lock:
+                    self._thread = None
+                return
+
+    def _ship(self, lines):
+        with self._lock:
+            key = build_log_batch_key(self.run_id, self._sequence, self.started_at)
+            self._sequence += 1
+        try:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body="".join(lines).encode("utf-8"),
+                ContentType="application/x-ndjson"
+            )
+        except Exception as e:
+            # Logging must never take the ETL down; the entries are still in the process logs
+            print(f"Failed to ship {len(lines)} log entries to S3: {e}")
@@ -0,0 +1,141 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from constants import (
+    NAMESPACE, DIMENSION_NAME, DIMENSION_VALUE, METRICS_FLUSH_INTERVAL, METRICS_MAX_DATUMS_PER_REQUEST
+)
+
+class MetricsEmitter:
+    """
+    Aggregates metrics in process and sends them to CloudWatch in batches.
+
+    Every counter and timer sample for the same metric, unit and dimensions between two flushes is
+    folded into one statistic set (count, sum, min, max); a gauge keeps its latest value. A flush
+    sends the aggregates in PutMetricData calls of up to `max_datums` datums. Flushes happen every
+    `flush_interval` seconds from a background thread, on `flush()`, and at process exit.
+
+    Parameters:
+        client: CloudWatch client.
+        namespace (str): Default CloudWatch namespace.
+        dimensions (dict): Dimensions added to every metric.
+        flush_interval (float): Seconds between background flushes.
+        max_datums (int): Datums per PutMetricData request.
+    """
+
+    def __init__(self, client, namespace=NAMESPACE, dimensions=None, flush_interval=METRICS_FLUSH_INTERVAL,
+                 max_datums=METRICS_MAX_DATUMS_PER_REQUEST):
+        self.client = client
+        self.namespace = namespace
+        self.dimensions = {DIMENSION_NAME: DIMENSION_VALUE} if dimensions is None else dimensions
+        self.flush_interval = flush_interval
+        self.max_datums = max_datums
+        self._lock = threading.Lock()
+        self._statistics = {}
+        self._gauges = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _key(self, name, unit, dimensions, namespace):
+        merged = dict(self.dimensions, **(dimensions or {}))
+        return namespace or self.namespace, name, unit, tuple(sorted(merged.items()))
+
+    def record(self, name, value, unit="Count", dimensions=None, namespace=None):
+        """
+        Adds one sample to the metric's statistic set.
+        """
+        key = self._key(name, unit, dimensions, namespace)
+        with self._lock:
+            statistics = self._statistics.get(key)
+            if statistics is None:
+                self._statistics[key] = {"SampleCount": 1, "Sum": value, "Minimum": value, "Maximum": value}
+            else:
+                statistics["SampleCount"] += 1
+                statistics["Sum"] += value
+                statistics["Minimum"] = min(statistics["Minimum"], value)
+                statistics["Maximum"] = max(statistics["Maximum"], value)
+        self._ensure_started()
+
+    def increment(self, name, value=1, dimensions=None, namespace=None):
+        self.record(name, value, unit="Count", dimensions=dimensions, namespace=namespace)
+
+    def gauge(self, name, value, unit="None", dimensions=None, namespace=None):
+        """
+        Sets the metric to `value`; only the latest value before a flush is sent.
+        """
+        with self._lock:
+            self._gauges[self._key(name, unit, dimensions, namespace)] = value
+        self._ensure_started()
+
+    @contextmanager
+    def timer(self, name, dimensions=None, namespace=None):
+        """
+        Records the duration of the `with` block in milliseconds, also when it raises.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000, unit="Milliseconds",
+                        dimensions=dimensions, namespace=namespace)
+
+    def flush(self):
+        """
+        Sends everything aggregated since the last flush. Returns the number of datums sent.
+        """
+        with self._lock:
+            statistics, self._statistics = self._statistics, {}
+            gauges, self._gauges = self._gauges, {}
+        if not statistics and not gauges:
+            return 0
+
+        timestamp = datetime.now(timezone.utc)
+        by_namespace = {}
+        for (namespace, name, unit, dimensions), values in statistics.items():
+            by_namespace.setdefault(namespace, []).append(
+                self._datum(name, unit, dimensions, timestamp, StatisticValues=values)
+            )
+        for (namespace, name, unit, dimensions), value in gauges.items():
+            by_namespace.setdefault(namespace, []).append(
+                self._datum(name, unit, dimensions, timestamp, Value=value)
+            )
+
+        sent = 0
+        for namespace, datums in by_namespace.items():
+            for start in range(0, len(datums), self.max_datums):
+                batch = datums[start:start + self.max_datums]
+                try:
+                    self.client.put_metric_data(Namespace=namespace, MetricData=batch)
+                    sent += len(batch)
+                except Exception as e:
+                    # Metrics must never take the ETL down
+                    print(f"Failed to send {len(batch)} metrics to CloudWatch: {e}")
+        return sent
+
+    @staticmethod
+    def _datum(name, unit, dimensions, timestamp, **value):
+        return dict(
+            MetricName=name,
+            Dimensions=[{"Name": dimension, "Value": str(dimension_value)} for dimension, dimension_value in dimensions],
+            Timestamp=timestamp,
+            Unit=unit,
+            **value
+        )
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cloudwatch-metrics", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,55 @@
+import threading
+import time
+from constants import ZOHO_REQUESTS_PER_SECOND, ZOHO_REQUEST_BURST
+
+class TokenBucket:
+    """
+    Request budget shared by every thread that calls the same API.
+
+    Tokens refill at `rate` per second up to `capacity`; `acquire()` blocks until one is available.
+    When the API answers 429, `pause()` stops every caller until the Retry-After has passed, so
+    modules extracted in parallel back off together instead of each hitting the limit.
+
+    Parameters:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum tokens, i.e. the largest burst.
+        clock (callable): Monotonic clock, injectable for tests.
+        sleep (callable): Sleep function, injectable for tests.
+    """
+
+    def __init__(self, rate=ZOHO_REQUESTS_PER_SECOND, capacity=ZOHO_REQUEST_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0
+
+    def acquire(self):
+        """
+        Takes one token, waiting for the refill or the end of a pause. Returns the seconds waited.
+        """
+        waited = 0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            self._sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """
+        Holds every caller for `seconds`, e.g. the Retry-After of a 429.
+        """
+        with self._lock:
+            now = self._clock()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0
+            self._updated = now
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from datetime import datetime
 
 def build_count_discrepancies_key(date=None):
@@ -18,4 +20,65 @@ def build_s3_key_backup_leads(date=None):
 def build_mongo_backup_data_key(date=None):
     """Generate the S3 key for MongoDB leads backup."""
     date = date or datetime.now()
-    return f"mongo-backup/mongo-leads-backup-{date.strftime('%d-%m-%Y')}.json"
\ No newline at end of file
+    return f"mongo-backup/mongo-leads-backup-{date.strftime('%d-%m-%Y')}.json"
+def build_extraction_staging_prefix(modified_since=None, max_records=None, module="Leads"):
+    """
+    Generate the S3 prefix holding checkpointed Zoho pages for a resumable extraction. It identifies
+    the extraction, not the day, so a crashed run is resumed by the next run with the same watermark
+    and record cap, even after midnight or on the next scheduled night.
+    """
+    identity = json.dumps({"module": module, "modified_since": modified_since, "max_records": max_records}, sort_keys=True)
+    return f"zoho-staging/{module.lower()}-{hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]}/"
+
+
+def build_mongo_backup_ndjson_key(date=None):
+    """Generate the S3 key for the streamed, gzip-compressed NDJSON MongoDB leads backup."""
+    date = date or datetime.now()
+    return f"mongo-backup/mongo-leads-backup-{date.strftime('%d-%m-%Y')}.ndjson.gz"
+
+def build_manifest_key(data_key):
+    """Generate the S3 key of the manifest stored next to a backup object."""
+    return f"{data_key}.manifest.json"
+
+
+def build_parquet_backup_key(source, module, date=None):
+    """Generate the partitioned S3 key for a Parquet backup of one Zoho module."""
+    date = date or datetime.now()
+    return f"{source}/parquet/module={module}/date={date.strftime('%Y-%m-%d')}/part-0000.parquet"
+
+def build_log_batch_key(run_id, sequence, date=None):
+    """Generate the S3 key for one NDJSON batch of a run's log entries."""
+    date = date or datetime.now()
+    return f"logs/{date.strftime('%d-%m-%Y')}/{run_id}/{sequence:06d}.ndjson"
+
+def build_timing_report_key(run_id, date=None):
+    """Generate the S3 key for a run's JSON timing report, stored with its logs."""
+    date = date or datetime.now()
+    return f"logs/{date.strftime('%d-%m-%Y')}/{run_id}/timing-report.json"
+
+def build_profile_key(run_id, stage, name, date=None):
+    """Generate the S3 key for one profiler output of a run stage."""
+    date = date or datetime.now()
+    stage = stage.lower().replace(" ", "-")
+    return f"logs/{date.strftime('%d-%m-%Y')}/{run_id}/profile/{stage}.{name}"
+
+def build_module_backup_key(module, date=None):
+    """Generate the S3 key for the backup of one Zoho module; for Leads this is the leads backup key."""
+    date = date or datetime.now()
+    return f"zoho-backup/{module.lower()}-{date.strftime('%d-%m-%Y')}.json"
+
+def build_run_keys(date=None):
+    """Generate the dated S3 keys of one run from its start, so every stage of the run uses the same date."""
+    date = date or datetime.now()
+    return {
+        "zoho_backup": build_s3_key_backup_leads(date),
+        "mongo_backup": build_mongo_backup_data_key(date),
+        "mongo_backup_ndjson": build_mongo_backup_ndjson_key(date),
+        "data_discrepancies": build_data_discrepancies_key(date),
+        "count_discrepancies": build_count_discrepancies_key(date)
+    }
+
+def build_duplicate_backup_key(module, date=None):
+    """Generate the S3 key holding the documents removed by the duplicate-key migration."""
+    date = date or datetime.now()
+    return f"migrations/duplicate-{module.lower()}-{date.strftime('%d-%m-%Y-%H%M%S')}.json"
@@ -0,0 +1,161 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from config import s3_client
+from constants import S3_MULTIPART_PART_SIZE
+from digests import BucketedDigest
+
+class S3MultipartWriter:
+    """
+    File-like writer that streams data to an S3 object through a multipart upload.
+    Data is buffered only until a part is full, so memory stays at roughly one part per upload
+    worker however much is written. Objects smaller than one part are sent with a single put_object.
+
+    With `max_workers` above 1, full parts are uploaded in parallel while writing continues; at most
+    `max_workers` parts are in flight before the writer waits for the oldest one.
+    """
+
+    def __init__(self, bucket, key, part_size=S3_MULTIPART_PART_SIZE, content_type="application/json", client=None,
+                 max_workers=1):
+        self.client = client or s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.content_type = content_type
+        self.max_workers = max_workers
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._parts = []
+        self._pending = []
+        self._executor = None
+        self._upload_id = None
+        self.closed = False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def tell(self):
+        return self.bytes_written
+
+    def flush(self):
+        pass
+
+    def _upload_part(self):
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + len(self._pending) + 1
+        body, self._buffer = bytes(self._buffer), bytearray()
+        if self.max_workers <= 1:
+            self._parts.append(self._send_part(part_number, body))
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._pending.append(self._executor.submit(self._send_part, part_number, body))
+        # Bound the memory held by parts waiting to be uploaded
+        if len(self._pending) >= self.max_workers:
+            self._parts.append(self._pending.pop(0).result())
+
+    def _send_part(self, part_number, body):
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            PartNumber=part_number,
+            UploadId=self._upload_id,
+            Body=body
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    def _wait_for_parts(self):
+        while self._pending:
+            self._parts.append(self._pending.pop(0).result())
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def close(self):
+        """
+        Uploads whatever is still buffered and completes the object. If a part or the completion
+        fails, the multipart upload is aborted before the error is raised, so no parts are orphaned.
+        """
+        if self.closed:
+            return
+        if self._upload_id is None:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self._buffer),
+                ContentType=self.content_type
+            )
+        else:
+            try:
+                if self._buffer:
+                    self._upload_part()
+                self._wait_for_parts()
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts}
+                )
+            except Exception:
+                self.abort()
+                raise
+        self._buffer = bytearray()
+        self.closed = True
+
+    def abort(self):
+        """Discards the upload so no partial object or orphaned parts are left behind."""
+        for future in self._pending:
+            future.cancel()
+        self._pending = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        self._buffer = bytearray()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+class S3JsonArrayWriter(S3MultipartWriter):
+    """
+    Streams records to S3 as a single JSON array, matching the layout of the existing backups.
+    The dataset digest of everything written is kept in `digest`.
+    """
+
+    def __init__(self, bucket, key, **kwargs):
+        super().__init__(bucket, key, **kwargs)
+        self.record_count = 0
+        self.digest = BucketedDigest()
+        self.write("[")
+
+    def write_records(self, records):
+        for record in records:
+            self.write(("," if self.record_count else "") + json.dumps(record))
+            self.digest.update(record)
+            self.record_count += 1
+
+    def close(self):
+        if self.closed:
+            return
+        self.write("]")
+        super().close()
@@ -0,0 +1,25 @@
+import json
+from config import secrets_client
+from cache import secret_cache
+
+# Function to fetch Zoho CRM API secret from AWS Secrets Manager
+def get_zoho_secret(secret_name):
+    """
+    Fetches the Zoho CRM API credentials from AWS Secrets Manager.
+    The secret is cached for SECRET_CACHE_TTL seconds; see invalidate_secret.
+    
+    Args:
+        secret_name (str): The name of the secret containing Zoho CRM credentials.
+        
+    Returns:
+        dict: The Zoho CRM credentials (e.g., refresh token, client ID, etc.).
+    """
+    def load_secret():
+        response = secrets_client.get_secret_value(SecretId=secret_name)
+        return json.loads(response['SecretString'])
+
+    return secret_cache.get_or_load(f"secret:{secret_name}", load_secret)
+
+# Forget a cached secret so the next lookup reads it from Secrets Manager again
+def invalidate_secret(secret_name):
+    secret_cache.invalidate(f"secret:{secret_name}")
@@ -0,0 +1,188 @@
+import cProfile
+import io
+import itertools
+import json
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from constants import S3_BUCKET_NAME, PROFILE_STAGES, TRACE_SUB_SPANS, PROFILE_TOP_STATS
+from s3_key_builders import build_timing_report_key, build_profile_key
+
+class RunTracer:
+    """
+    Collects timing spans for one ETL run and writes them as a JSON timing report.
+
+    `stage()` wraps a top-level stage (extraction, load, backup, validation) and `span()` a unit of
+    work inside one, such as a Zoho page or a load batch. Sub-spans are only kept when `sub_spans`
+    is on, so production runs pay for them only when asked. Spans nest per thread; spans opened in
+    worker threads record the thread name instead of a parent.
+
+    With `profile` on, each stage also runs under cProfile and tracemalloc. The profile covers the
+    thread that runs the stage; the top allocations and the peak traced memory are recorded too.
+
+    Parameters:
+        run_id (str): ID of the run, shared with the log batches.
+        profile (bool): Profile CPU and memory per stage.
+        sub_spans (bool): Keep per-page and per-batch spans.
+        metrics: Optional MetricsEmitter receiving each stage's latency.
+    """
+
+    def __init__(self, run_id=None, profile=PROFILE_STAGES, sub_spans=TRACE_SUB_SPANS, metrics=None):
+        self.metrics = metrics
+        self.default_profile = profile
+        self.default_sub_spans = sub_spans
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.start_run(run_id)
+
+    def start_run(self, run_id=None, profile=None, sub_spans=None, started_at=None):
+        """
+        Drops the spans of the previous run, e.g. in a warm Lambda container. `profile` and `sub_spans`
+        apply to this run only; None uses the tracer's defaults, so one profiled invocation does not
+        leave profiling on for the next. `started_at` dates the run's reports; now when not given.
+        """
+        with self._lock:
+            self.run_id = run_id
+            self.profile = self.default_profile if profile is None else profile
+            self.sub_spans = self.default_sub_spans if sub_spans is None else sub_spans
+            self.started_at = started_at or datetime.now()
+            self._started = time.perf_counter()
+            self._ids = itertools.count(1)
+            self.spans = []
+            self.profiles = {}
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name, detail=True, **attributes):
+        """
+        Times the `with` block. `detail=True` spans are skipped unless sub-spans are enabled.
+        """
+        if detail and not self.sub_spans:
+            yield None
+            return
+        stack = self._stack()
+        span = {
+            "id": next(self._ids),
+            "name": name,
+            "parent": stack[-1]["id"] if stack else None,
+            "thread": threading.current_thread().name,
+            "attributes": attributes,
+            "start_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "status": "SUCCESS"
+        }
+        stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["status"] = "ERROR"
+            span["error"] = str(e)
+            raise
+        finally:
+            span["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    @contextmanager
+    def stage(self, name, **attributes):
+        """
+        Times a top-level stage, publishes its latency and, when enabled, profiles it.
+        """
+        with self.span(name, detail=False, kind="stage", **attributes) as span:
+            if not self.profile:
+                try:
+                    yield span
+                finally:
+                    self._publish(name, span)
+                return
+
+            profiler = cProfile.Profile()
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            try:
+                profiler.enable()
+                profiling = True
+            except ValueError:
+                # Another profiler is already active on this thread, e.g. for a nested stage
+                profiling = False
+            try:
+                yield span
+            finally:
+                if profiling:
+                    profiler.disable()
+                snapshot = tracemalloc.take_snapshot()
+                span["memory_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+                self._keep_profile(name, profiler if profiling else None, snapshot)
+                self._publish(name, span)
+
+    def _publish(self, name, span):
+        if self.metrics is not None:
+            duration_ms = (time.perf_counter() - self._started) * 1000 - span["start_ms"]
+            self.metrics.record("StageLatency", duration_ms, unit="Milliseconds", dimensions={"Stage": name})
+
+    def _keep_profile(self, name, profiler, snapshot):
+        outputs = {}
+        if profiler is not None:
+            # Same format as cProfile's dump_stats, readable with pstats or snakeviz
+            profiler.create_stats()
+            outputs["cprofile.pstats"] = marshal.dumps(profiler.stats)
+            stats_text = io.StringIO()
+            pstats.Stats(profiler, stream=stats_text).sort_stats("cumulative").print_stats(PROFILE_TOP_STATS)
+            outputs["cprofile.txt"] = stats_text.getvalue()
+        top_allocations = snapshot.statistics("lineno")[:PROFILE_TOP_STATS]
+        outputs["tracemalloc.txt"] = "\n".join(str(statistic) for statistic in top_allocations)
+        with self._lock:
+            self.profiles[name] = outputs
+
+    def report(self):
+        """
+        Returns the timing report: run totals plus every span in start order.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+        stages = {span["name"]: span["duration_ms"] for span in spans if span["attributes"].get("kind") == "stage"}
+        return {
+            "run_id": self.run_id,
+            "started_at": str(self.started_at),
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "stages_ms": stages,
+            "spans": spans
+        }
+
+    def save_report(self, client, bucket=S3_BUCKET_NAME):
+        """
+        Writes the timing report, and the profiles of profiled stages, next to the run's logs.
+
+        Returns:
+            str: S3 key of the timing report.
+        """
+        key = build_timing_report_key(self.run_id, self.started_at)
+        client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=json.dumps(self.report(), default=str),
+            ContentType="application/json"
+        )
+        for stage, outputs in self.profiles.items():
+            for name, body in outputs.items():
+                client.put_object(
+                    Bucket=bucket,
+                    Key=build_profile_key(self.run_id, stage, name, self.started_at),
+                    Body=body.encode("utf-8") if isinstance(body, str) else body,
+                    ContentType="text/plain" if isinstance(body, str) else "application/octet-stream"
+                )
+        return key
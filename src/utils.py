@@ -2,25 +2,50 @@ from datetime import datetime
 import json
 import logging
 from pymongo import MongoClient
-from unittest.mock import patch, MagicMock, mock_open
-import pymongo
-import pymongo
-import requests
 import time
-import boto3
+import os
+import gzip
+import codecs
 import hashlib
-from botocore.exceptions import NoCredentialsError
-from botocore.exceptions import ClientError
-from botocore.exceptions import NoCredentialsError, ClientError
-from config import s3_client, secrets_client, sns_client, ssm_client
+from botocore.exceptions import BotoCoreError, ClientError
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+from config import cloudwatch_client, s3_client, sns_client, ssm_client
 from constants import *
 from url_builders import *
+from http_session import get_http_session
+from token_manager import AccessTokenManager
+from cache import secret_cache
+from mongo_pool import MongoClientManager
+from shared import get_zoho_secret, invalidate_secret
+from s3_stream import S3MultipartWriter
+from s3_key_builders import (
+    build_manifest_key, build_s3_key_backup_leads, build_mongo_backup_data_key, build_mongo_backup_ndjson_key,
+    build_data_discrepancies_key, build_duplicate_backup_key
+)
+from parquet_backup import ParquetBackupWriter
+from digests import BucketedDigest, email_bucket, normalize_email
+from comparison import REQUIRED_FIELDS, compare_record_sets
+from log_shipper import S3LogShipper
+from metrics import MetricsEmitter
+from tracing import RunTracer
+from zoho_modules import LEADS_MODULE
+
+# Log entries of this process, shipped to S3 in batches by a background thread
+log_shipper = S3LogShipper(S3_BUCKET_NAME, client=s3_client)
+
+# Metrics of this process, aggregated and sent to CloudWatch in batches
+metrics = MetricsEmitter(cloudwatch_client)
+
+# Stage and sub-stage timings of the current run, saved with its logs
+tracer = RunTracer(run_id=log_shipper.run_id, metrics=metrics)
 
 
 def save_log_to_s3(stage=None, message=None, status="IN_PROGRESS", error_message=None, record=None):
     """
     Logs a message or error with details to S3, allowing for different stages, statuses, and error handling.
-    Creates a log entry with details like timestamp, stage, status, message, or error, and uploads it to S3.
+    Creates a log entry with details like timestamp, stage, status, message, or error, and queues it for
+    the background log shipper, which uploads the run's entries to S3 in NDJSON batches.
 
     Parameters:
         stage (str): Current stage of the ETL process, if applicable.
@@ -32,42 +57,77 @@ def save_log_to_s3(stage=None, message=None, status="IN_PROGRESS", error_message
     # Create log entry with provided details
     log_entry = {
         "timestamp": str(datetime.now()),
+        "run_id": log_shipper.run_id,
         "status": status,
         "stage": stage,
         "message": message,
         "error_message": error_message,
         "record": record
     }
-    
-    # Set the log file name based on status and message/error content
-    if status == "ERROR":
-        brief_error = (error_message or "error").replace(" ", "_").replace("/", "_")[:20]
-        s3_key = f"logs/{datetime.now().strftime('%d-%m-%Y')}/error_{brief_error}.json"
-    else:
-        brief_message = (message or "log").replace(" ", "_").replace("/", "_")[:20]
-        s3_key = f"logs/{datetime.now().strftime('%d-%m-%Y')}/success_{brief_message}.json"
-    
+
     # Log to CloudWatch if necessary (example; this part is disabled by default)
-    logging.error(json.dumps(log_entry)) if status == "ERROR" else logging.info(json.dumps(log_entry))
-    
-    # Attempt to save the log entry to S3
+    logging.error(json.dumps(log_entry, default=str)) if status == "ERROR" else logging.info(json.dumps(log_entry, default=str))
+
+    # Queue the log entry; it is shipped to S3 without blocking the calling stage
+    if not log_shipper.emit(log_entry):
+        print(f"Log queue full, dropped log entry: {message or error_message}")
+
+# Ship every queued log entry to S3, e.g. before a Lambda invocation returns
+def flush_logs(timeout=30):
+    return log_shipper.flush(timeout)
+
+# Send the aggregated metrics to CloudWatch, e.g. before a Lambda invocation returns
+def flush_metrics():
+    return metrics.flush()
+
+# Store the run's timing report and stage profiles next to its logs
+def save_timing_report():
     try:
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=s3_key,
-            Body=json.dumps(log_entry),
-            ContentType="application/json"
-        )
-    except NoCredentialsError as e:
-        print("Credentials not available for S3: ", e)
+        key = tracer.save_report(s3_client)
+        print(f"Timing report saved to S3: {key}")
+        return key
+    except (ClientError, BotoCoreError) as e:
+        print(f"Failed to save the timing report to S3: {e}")
+
+# Record how many records a stage handled and its throughput since `started` (a time.perf_counter() value)
+def record_throughput(stage, record_count, started):
+    elapsed = time.perf_counter() - started
+    metrics.increment("RecordsProcessed", record_count, dimensions={"Stage": stage})
+    if elapsed > 0:
+        metrics.gauge("RecordsPerSecond", record_count / elapsed, unit="Count/Second", dimensions={"Stage": stage})
+
+# Exchange the Zoho refresh token for an access token
+def request_access_token():
+    """
+    Requests a new Zoho access token.
 
-# # Function to fetch Zoho CRM API token
-def get_zoho_secret(secret_name):
-    response = secrets_client.get_secret_value(SecretId=secret_name)
-    return json.loads(response['SecretString'])
+    Returns:
+        tuple: The access token and its lifetime in seconds.
+    """
+    response = get_http_session().post(build_access_token_url())
+    response.raise_for_status()
+    token_data = response.json()
+    if "access_token" not in token_data:
+        # A rejected client or refresh token may have been rotated in Secrets Manager
+        if token_data.get("error") in ("invalid_client", "invalid_code"):
+            invalidate_secret(ZOHO_CRM_CREDENTIAL)
+        raise Exception(f"Failed to obtain Zoho access token: {token_data.get('error', 'unknown error')}")
+    return token_data["access_token"], int(token_data.get("expires_in", ZOHO_TOKEN_DEFAULT_EXPIRES_IN))
+
+# Process-wide cache of the Zoho access token
+access_token_manager = AccessTokenManager(request_access_token)
+
+# Get the cached Zoho access token, refreshing it when it is about to expire
+def get_access_token():
+    return access_token_manager.get_token()
+
+# Drop an access token that Zoho rejected
+def invalidate_access_token(access_token=None):
+    access_token_manager.invalidate(access_token)
 
 # Fetch the access token
 def test_get_access_token():
+    from unittest.mock import patch
     with patch('requests.post') as mock_post:
         # Mock the response for the access token
         mock_post.return_value.status_code = 200
@@ -79,6 +139,7 @@ def test_get_access_token():
 
 # Download CA certificate for MongoDB
 def test_download_ca_certificate():
+    from unittest.mock import patch, mock_open
     with patch('requests.get') as mock_get:
         # Mock the certificate download
         mock_get.return_value.status_code = 200
@@ -92,13 +153,12 @@ def test_download_ca_certificate():
 
 # Get MongoDB credentials from Secrets Manager
 def get_mongo_credentials():
-    secret_name = SECRET_NAME
-    response = secrets_client.get_secret_value(SecretId=secret_name)
-    secret = json.loads(response['SecretString'])
+    secret = get_zoho_secret(SECRET_NAME)
     return secret['username'], secret['password'], secret['host'], secret['port']
 
 # Function to get the leads collection
 def test_get_leads_collection():
+    from unittest.mock import patch, MagicMock
     with patch('pymongo.MongoClient') as mock_mongo_client:
         # Mock the MongoDB client and its methods
         mock_db = MagicMock()
@@ -114,10 +174,187 @@ def test_get_leads_collection():
         assert collection == mock_collection
         mock_db.create_collection.assert_not_called()  # Collection already exists
 
+# Download CA certificate for MongoDB
+def download_ca_certificate(ca_bundle_path=CA_LAMBDA_BUNDLE_PATH):
+    response = get_http_session().get(build_ca_certificate_url())
+    response.raise_for_status()
+    if b"-----BEGIN CERTIFICATE-----" not in response.content:
+        raise Exception("Downloaded CA bundle does not contain any PEM certificate")
+
+    # Write the bundle and its checksum atomically so a crash never leaves a truncated bundle in place
+    temp_path = f"{ca_bundle_path}.tmp"
+    with open(temp_path, 'wb') as ca_file:
+        ca_file.write(response.content)
+    os.replace(temp_path, ca_bundle_path)
+    with open(f"{ca_bundle_path}.sha256", 'w') as checksum_file:
+        checksum_file.write(hashlib.sha256(response.content).hexdigest())
+    return ca_bundle_path
+
+# Check that a cached CA bundle is recent and matches the checksum recorded when it was downloaded
+def is_ca_bundle_valid(ca_bundle_path=CA_LAMBDA_BUNDLE_PATH, ttl=CA_BUNDLE_TTL):
+    try:
+        if time.time() - os.path.getmtime(ca_bundle_path) > ttl:
+            return False
+        with open(ca_bundle_path, 'rb') as ca_file:
+            digest = hashlib.sha256(ca_file.read()).hexdigest()
+        with open(f"{ca_bundle_path}.sha256") as checksum_file:
+            return checksum_file.read().strip() == digest
+    except OSError:
+        return False
+
+# Provide a usable CA bundle, downloading it only when the cached copy is missing, stale or corrupt
+def ensure_ca_bundle(ca_bundle_path=CA_LAMBDA_BUNDLE_PATH, force_refresh=False):
+    """
+    Returns the path of the CA bundle to use for DocumentDB TLS.
+
+    Parameters:
+        ca_bundle_path (str): Where the downloaded bundle is cached.
+        force_refresh (bool): Download again even if the cached bundle is valid, e.g. after a TLS failure.
+    """
+    if not force_refresh and is_ca_bundle_valid(ca_bundle_path):
+        return ca_bundle_path
+    try:
+        return download_ca_certificate(ca_bundle_path)
+    except Exception as e:
+        if os.path.exists(CA_PACKAGED_BUNDLE_PATH):
+            print(f"CA bundle download failed ({e}); using the packaged bundle.")
+            return CA_PACKAGED_BUNDLE_PATH
+        raise
+
+def _open_documentdb_client(ca_bundle_path, pool_options):
+    username, password, host, port = get_mongo_credentials()
+    client = MongoClient(build_mongo_uri(username, password, host, port, DATABASE, ca_bundle_path), **pool_options)
+    try:
+        client.admin.command("ping")
+    except OperationFailure as e:
+        # Authentication failed: the cached credentials may be stale after a rotation
+        if e.code == 18:
+            invalidate_secret(SECRET_NAME)
+        client.close()
+        raise
+    except Exception:
+        client.close()
+        raise
+    return client
+
+# Connect to DocumentDB with the given pool options
+def connect_to_documentdb(**pool_options):
+    try:
+        return _open_documentdb_client(ensure_ca_bundle(), pool_options)
+    except ServerSelectionTimeoutError as e:
+        # A certificate failure may mean the cached bundle is outdated; fetch it again once
+        if "certificate" not in str(e).lower() and "ssl" not in str(e).lower():
+            raise
+        print("TLS handshake with DocumentDB failed. Refreshing the CA bundle and retrying...")
+        return _open_documentdb_client(ensure_ca_bundle(force_refresh=True), pool_options)
+
+# Shared DocumentDB client reused by every stage and warm invocation
+mongo_client_manager = MongoClientManager(connect_to_documentdb)
+
+# Return the leads collection from the shared DocumentDB client
+def get_leads_collection():
+    return mongo_client_manager.get_collection(COLLECTION_NAME)
+
+# Connection pool settings and counters of the shared DocumentDB client
+def get_mongo_pool_stats():
+    return mongo_client_manager.pool_stats()
+
+# Collection a Zoho module is loaded into
+def get_module_collection(module):
+    return mongo_client_manager.get_collection(module.collection)
+
+# Make sure a module's collection has the unique normalized-key index the upserts rely on
+def ensure_record_indexes(collection, module):
+    """
+    Creates the unique, sparse index on the module's key store field. The first time, records inserted
+    before the index existed are backfilled with their normalized key so they are matched instead of duplicated.
+    """
+    key_store_field = module.key_store_field
+    index_name = f"{key_store_field}_unique"
+    if index_name in collection.index_information():
+        return
+
+    backfill = []
+    for record in collection.find({key_store_field: {"$exists": False}}, {module.key_field: 1}):
+        record_key = module.record_key(record)
+        if record_key:
+            backfill.append(UpdateOne({"_id": record["_id"]}, {"$set": {key_store_field: record_key}}))
+    for start in range(0, len(backfill), LOAD_BATCH_SIZE):
+        collection.bulk_write(backfill[start:start + LOAD_BATCH_SIZE], ordered=False)
+
+    # Duplicates are never deleted as a side effect of a load; an operator resolves them with dedupe_keys.py
+    duplicates = find_duplicate_keys(collection, module)
+    if duplicates:
+        message = (f"{len(duplicates)} {module.name} keys in {key_store_field} have more than one document, so the unique "
+                   f"index cannot be created. Review them with `python dedupe_keys.py {module.name}` and remove them "
+                   f"with `--apply`.")
+        save_log_to_s3(
+            stage="Index Creation",
+            status="ERROR",
+            message=message,
+            record={"keys": sorted(duplicates)[:100]}
+        )
+        raise Exception(message)
+    collection.create_index([(key_store_field, ASCENDING)], name=index_name, unique=True, sparse=True)
+
+# Keys shared by more than one document, which would make the unique index fail
+def find_duplicate_keys(collection, module):
+    """
+    Loads before the unique index existed appended every run's leads, so one normalized email can
+    have several documents, e.g. "A@Example.com" and "a@example.com".
+
+    Returns:
+        dict: Document ids per duplicated key, oldest first.
+    """
+    key_store_field = module.key_store_field
+    duplicates = collection.aggregate([
+        {"$match": {key_store_field: {"$exists": True}}},
+        {"$group": {"_id": f"${key_store_field}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    return {duplicate["_id"]: sorted(duplicate["ids"]) for duplicate in duplicates}
+
+# One-off migration collapsing documents that share a normalized key; see dedupe_keys.py
+def remove_duplicate_keys(collection, module, dry_run=True, backup_key=None):
+    """
+    Keeps the most recently inserted document of each duplicated key (highest ObjectId). Unless
+    `dry_run` is set, the other documents are first written to S3 under `backup_key` and only then
+    deleted, so the migration can be undone.
+
+    Returns:
+        dict: The duplicated key count, the documents to remove and, when applied, the backup key.
+    """
+    duplicates = find_duplicate_keys(collection, module)
+    stale_ids = [document_id for ids in duplicates.values() for document_id in ids[:-1]]
+    report = {"module": module.name, "duplicate_keys": len(duplicates), "documents": len(stale_ids), "dry_run": dry_run}
+    print(f"{len(stale_ids)} duplicate {module.name} documents share {len(duplicates)} keys.")
+    if dry_run or not stale_ids:
+        return report
+
+    stale_documents = []
+    for start in range(0, len(stale_ids), LOAD_BATCH_SIZE):
+        stale_documents.extend(collection.find({"_id": {"$in": stale_ids[start:start + LOAD_BATCH_SIZE]}}))
+    backup_key = backup_key or build_duplicate_backup_key(module.name)
+    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=backup_key, Body=json.dumps(stale_documents, default=str))
+
+    for start in range(0, len(stale_ids), LOAD_BATCH_SIZE):
+        collection.delete_many({"_id": {"$in": stale_ids[start:start + LOAD_BATCH_SIZE]}})
+    save_log_to_s3(
+        stage="Duplicate Key Migration",
+        status="SUCCESS",
+        message=f"Removed {len(stale_ids)} duplicate {module.name} documents sharing {len(duplicates)} keys",
+        record={"backup_key": backup_key, "duplicate_keys": len(duplicates), "documents": len(stale_ids)}
+    )
+    return dict(report, backup_key=backup_key)
+
+# Make sure the leads collection has the unique normalized-email index the upserts rely on
+def ensure_leads_indexes(leads_collection):
+    ensure_record_indexes(leads_collection, LEADS_MODULE)
+
 # Retrieve leads from MongoDB
 def get_mongo_leads():
-    leads_collection = test_get_leads_collection()
-    leads = list(leads_collection.find({}, {"_id": 0}))
+    leads_collection = get_leads_collection()
+    leads = list(leads_collection.find({}, LEAD_PROJECTION))
     return {lead["Email"]: lead for lead in leads}
 
 def calculate_md5(data):
@@ -126,19 +363,57 @@ def calculate_md5(data):
     md5.update(json.dumps(data, sort_keys=True).encode('utf-8'))
     return md5.hexdigest()
 
+def calculate_record_hash(record):
+    """
+    Helper function to calculate the MD5 checksum of one lead, ignoring MongoDB and internal fields,
+    so the same Zoho data always hashes the same whether it comes from Zoho or DocumentDB.
+    """
+    return calculate_md5({field: value for field, value in record.items() if field not in LEAD_PROJECTION})
+
+# Store the record count and dataset digest of a backup next to it
+def save_backup_manifest(backup_key, digest, **details):
+    """
+    Writes `<backup_key>.manifest.json` so later validation can compare backups without reading them.
+
+    Parameters:
+        backup_key (str): S3 key of the backup the manifest describes.
+        digest (BucketedDigest): Digest of the records in the backup, with its per-bucket digests.
+        details: Extra fields to store, e.g. format or checksums.
+
+    Returns:
+        dict: The manifest.
+    """
+    manifest = dict(key=backup_key, created_at=str(datetime.now()), **digest.to_dict(), **details)
+    s3_client.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=build_manifest_key(backup_key),
+        Body=json.dumps(manifest),
+        ContentType="application/json"
+    )
+    return manifest
+
+# Load the manifest stored next to a backup, or None for backups written without one
+def load_backup_manifest(backup_key):
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=build_manifest_key(backup_key))
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return json.loads(response['Body'].read().decode('utf-8'))
+
 # backup data loaded to MongoDB to S3 bucket
-def backup_mongo_data_to_s3():
+def backup_mongo_data_to_s3(backup_key=None):
     """
     Backup MongoDB data (leads collection) to S3 bucket.
+
+    Parameters:
+        backup_key (str): S3 key of the backup; defaults to today's MongoDB backup key.
     """
+    backup_key = backup_key or build_mongo_backup_data_key()
     try:
-        # Initialize the S3 client
-        s3_client = boto3.client('s3')
-
         # Fetch leads data from MongoDB
         print("Fetching leads data from MongoDB...")
-        leads_collection = test_get_leads_collection()
-        mongo_leads = list(leads_collection.find({}, {"_id": 0}))  # Exclude the '_id' field from MongoDB
+        leads_collection = get_leads_collection()
+        mongo_leads = list(leads_collection.find({}, LEAD_PROJECTION))  # Exclude '_id' and internal fields from MongoDB
         print(f"Fetched {len(mongo_leads)} records from MongoDB.")
 
         # Convert leads data to JSON
@@ -147,19 +422,24 @@ def backup_mongo_data_to_s3():
         # Upload JSON data to S3
         s3_client.put_object(
             Bucket=S3_BUCKET_NAME,
-            Key=MONGO_BACKUP_DATA_KEY,
+            Key=backup_key,
             Body=mongo_data_json,
             ContentType='application/json'
         )
-        print(f"MongoDB backup saved to S3: {MONGO_BACKUP_DATA_KEY}")
+        print(f"MongoDB backup saved to S3: {backup_key}")
+
+        digest = BucketedDigest()
+        digest.update_many(mongo_leads)
+        manifest = save_backup_manifest(backup_key, digest, format="json")
 
         # Log successful backup
         save_log_to_s3(
             stage="Backup",
             status="SUCCESS",
             message="MongoDB backup to S3 completed successfully",
-            record={"s3_key": MONGO_BACKUP_DATA_KEY, "record_count": len(mongo_leads)}
+            record={"s3_key": backup_key, "record_count": len(mongo_leads)}
         )
+        return manifest
     except Exception as e:
         print("An error occurred while backing up MongoDB data to S3.")
         save_log_to_s3(
@@ -170,20 +450,199 @@ def backup_mongo_data_to_s3():
         )
         raise e
 
-# compare backup data from zoho and mongodb
-def compare_backup_data_from_s3(zoho_backup_data_key, mongo_backup_data_key):
+# Stream the MongoDB leads collection to S3 as gzip-compressed NDJSON
+def stream_mongo_backup_to_s3(batch_size=MONGO_BACKUP_BATCH_SIZE, backup_key=None, parquet=PARQUET_BACKUP_ENABLED,
+                              run_date=None):
+    """
+    Backs up the leads collection without holding it in memory: the cursor is read in batches of
+    `batch_size`, each document is written as one JSON line through gzip, and the compressed stream
+    is uploaded in parallel multipart parts as they fill. A manifest with the record count, the
+    dataset digest and the SHA-256 of the uncompressed NDJSON is stored next to the backup. With `parquet`, the same pass
+    also writes a partitioned Parquet copy, partitioned by `run_date`. `backup_key` defaults to today's
+    NDJSON backup key.
+
+    Returns:
+        dict: The backup manifest.
+    """
+    backup_key = backup_key or build_mongo_backup_ndjson_key()
     try:
-        # Download Zoho backup data
-        zoho_backup_obj = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=zoho_backup_data_key)
-        zoho_backup_data = json.loads(zoho_backup_obj['Body'].read().decode('utf-8'))
+        print("Streaming leads data from MongoDB to S3...")
+        leads_collection = get_leads_collection()
+        checksum, digest = hashlib.sha256(), BucketedDigest()
+
+        parquet_backup = ParquetBackupWriter("mongo-backup", date=run_date) if parquet else None
+        try:
+            with S3MultipartWriter(S3_BUCKET_NAME, backup_key, content_type="application/gzip",
+                                   max_workers=S3_UPLOAD_WORKERS) as writer:
+                with gzip.GzipFile(fileobj=writer, mode="wb") as compressed:
+                    for lead in leads_collection.find({}, LEAD_PROJECTION, batch_size=batch_size):
+                        line = (json.dumps(lead, sort_keys=True) + "\n").encode("utf-8")
+                        checksum.update(line)
+                        digest.update(lead)
+                        compressed.write(line)
+                        if parquet_backup:
+                            parquet_backup.write_records((lead,))
+            if parquet_backup:
+                parquet_backup.close()
+        except Exception:
+            if parquet_backup:
+                parquet_backup.abort()
+            raise
+
+        manifest = save_backup_manifest(
+            backup_key,
+            digest,
+            format="ndjson.gz",
+            sha256=checksum.hexdigest(),
+            parquet_key=parquet_backup.key if parquet_backup else None
+        )
+        print(f"MongoDB backup streamed to S3: {backup_key} ({digest.count} records)")
+
+        save_log_to_s3(
+            stage="Backup",
+            status="SUCCESS",
+            message="MongoDB streaming backup to S3 completed successfully",
+            record=manifest
+        )
+        return manifest
+    except Exception as e:
+        print("An error occurred while streaming the MongoDB backup to S3.")
+        save_log_to_s3(
+            stage="Backup",
+            status="ERROR",
+            message="MongoDB streaming backup to S3 failed",
+            error_message=str(e)
+        )
+        raise e
+
+# Parse a JSON array one element at a time, so a large backup is never held in memory whole
+def iter_json_array(stream, chunk_size=BACKUP_READ_CHUNK_SIZE):
+    """
+    Parameters:
+        stream: Binary file-like object holding one UTF-8 JSON array, e.g. an S3 object body.
+        chunk_size (int): Bytes read per call to `stream.read`.
+
+    Returns:
+        generator: The array's elements, in order.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, eof = "", 0, False
+    expected = "["
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + text.decode(chunk or b"", final=eof)
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Backup JSON array ends before its closing bracket")
+            read_more()
+            continue
+        char = buffer[pos]
+        if expected == "[":
+            if char != "[":
+                raise ValueError("Backup is not a JSON array")
+            pos += 1
+            expected = "first"
+        elif expected == "separator":
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' in backup JSON array, found {char!r}")
+            pos += 1
+            expected = "element"
+        elif expected == "first" and char == "]":
+            return
+        else:
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            # A number may continue in the next chunk, so an element is only taken once text follows it
+            if end == len(buffer) and not eof:
+                read_more()
+                continue
+            pos = end
+            expected = "separator"
+            yield element
+
+# Read the records of a backup, either a JSON array or gzip-compressed NDJSON
+def iter_backup_records(backup_key):
+    backup_obj = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=backup_key)
+    if backup_key.endswith(".ndjson.gz"):
+        with gzip.GzipFile(fileobj=backup_obj['Body'], mode="rb") as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(backup_obj['Body'])
 
-        # Download MongoDB backup data
-        mongo_backup_obj = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=mongo_backup_data_key)
-        mongo_backup_data = json.loads(mongo_backup_obj['Body'].read().decode('utf-8'))
+# Index records by normalized email, computing their dataset digest in the same pass
+def index_records(records, buckets=None):
+    """
+    Parameters:
+        records (iterable): Lead records, e.g. from `iter_backup_records` or still in memory.
+        buckets (set): Only index records in these email buckets; all records when None.
+
+    Returns:
+        tuple: (BucketedDigest of the indexed records, dict of records keyed by normalized email)
+    """
+    digest, records_by_email = BucketedDigest(), {}
+    for record in records:
+        if buckets is not None and email_bucket(record.get("Email"), digest.bucket_count) not in buckets:
+            continue
+        digest.update(record)
+        records_by_email[normalize_email(record.get("Email"))] = record
+    return digest, records_by_email
+
+# Index a backup stored in S3
+def index_backup_records(backup_key, buckets=None):
+    return index_records(iter_backup_records(backup_key), buckets=buckets)
+
+# Field-level comparison of Zoho records against the MongoDB records with the same email
+def find_field_discrepancies(zoho_data_dict, mongo_data_dict, required_fields=REQUIRED_FIELDS):
+    return compare_record_sets(zoho_data_dict, mongo_data_dict, required_fields=required_fields)
+
+# Store and log the discrepancies found by a comparison
+def report_discrepancies(discrepancies, discrepancies_key=None):
+    if discrepancies:
+        print(f"Discrepancies found: {len(discrepancies)}")
+        s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=discrepancies_key or build_data_discrepancies_key(),
+                             Body=json.dumps(discrepancies))
+        save_log_to_s3(
+            stage="Validation",
+            status="ERROR",
+            message="Data mismatch found",
+            record={"discrepancies": discrepancies}
+        )
+    else:
+        print("Data match.")
+        save_log_to_s3(
+            stage="Validation",
+            status="SUCCESS",
+            message="Backup data match"
+        )
+
+# compare backup data from zoho and mongodb
+def compare_backup_data_from_s3(zoho_backup_data_key, mongo_backup_data_key, discrepancies_key=None):
+    try:
+        # Download Zoho and MongoDB backup data, indexed by email
+        zoho_digest, zoho_data_dict = index_backup_records(zoho_backup_data_key)
+        mongo_digest, mongo_data_dict = index_backup_records(mongo_backup_data_key)
 
         # Step 1: Compare record counts
-        zoho_data_count = len(zoho_backup_data)
-        mongo_data_count = len(mongo_backup_data)
+        zoho_data_count = zoho_digest.count
+        mongo_data_count = mongo_digest.count
         print(f"Zoho backup data count: {zoho_data_count}")
         print(f"MongoDB backup data count: {mongo_data_count}")
 
@@ -199,22 +658,18 @@ def compare_backup_data_from_s3(zoho_backup_data_key, mongo_backup_data_key):
                 }
             )
 
-        # Step 2: Compare checksums
-        zoho_data_md5 = calculate_md5(zoho_backup_data)
-        mongo_data_md5 = calculate_md5(mongo_backup_data)
-        print(f"Zoho MD5: {zoho_data_md5}")
-        print(f"MongoDB MD5: {mongo_data_md5}")
+        # Step 2: Compare order-independent dataset digests
+        print(f"Zoho digest: {zoho_digest.hexdigest()}")
+        print(f"MongoDB digest: {mongo_digest.hexdigest()}")
+        digest_record = {"zoho_digest": zoho_digest.hexdigest(), "mongo_digest": mongo_digest.hexdigest()}
 
-        if zoho_data_md5 != mongo_data_md5:
+        if zoho_digest != mongo_digest:
             print("Data integrity mismatch!")
             save_log_to_s3(
                 stage="Validation",
                 status="ERROR",
                 message="Data integrity mismatch",
-                record={
-                    "zoho_md5": zoho_data_md5,
-                    "mongo_md5": mongo_data_md5
-                }
+                record=digest_record
             )
         else:
             print("Data integrity match.")
@@ -222,60 +677,13 @@ def compare_backup_data_from_s3(zoho_backup_data_key, mongo_backup_data_key):
                 stage="Validation",
                 status="SUCCESS",
                 message="Data integrity match",
-                record={
-                    "zoho_md5": zoho_data_md5,
-                    "mongo_md5": mongo_data_md5
-                }
+                record=digest_record
             )
 
         # Step 3: Field-level comparison for discrepancies
-        discrepancies = []
-        required_fields = ["Last_Name", "First_Name", "Email", "Phone"]
-
-        # Create dictionaries for efficient lookup by email
-        mongo_data_dict = {record.get("Email", "").strip().lower(): record for record in mongo_backup_data}
-        zoho_data_dict = {record.get("Email", "").strip().lower(): record for record in zoho_backup_data}
-
-        # Check each Zoho record against MongoDB
-        for email, zoho_record in zoho_data_dict.items():
-            mongo_record = mongo_data_dict.get(email)
-
-            if not mongo_record:
-                discrepancies.append({
-                    "Email": email,
-                    "error": "Missing in MongoDB",
-                    "zoho_record": zoho_record
-                })
-                continue
-
-            for field in required_fields:
-                zoho_value = zoho_record.get(field, "Not Found")
-                mongo_value = mongo_record.get(field, "Not Found")
-                if zoho_value != mongo_value:
-                    discrepancies.append({
-                        "Email": email,
-                        "field": field,
-                        "zoho_value": zoho_value,
-                        "mongo_value": mongo_value
-                    })
-
-        # Log discrepancies
-        if discrepancies:
-            print(f"Discrepancies found: {len(discrepancies)}")
-            s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=DATA_DISCREPANCIES_KEY, Body=json.dumps(discrepancies))
-            save_log_to_s3(
-                stage="Validation",
-                status="ERROR",
-                message="Data mismatch found",
-                record={"discrepancies": discrepancies}
-            )
-        else:
-            print("Data match.")
-            save_log_to_s3(
-                stage="Validation",
-                status="SUCCESS",
-                message="Backup data match"
-            )
+        discrepancies = find_field_discrepancies(zoho_data_dict, mongo_data_dict)
+        report_discrepancies(discrepancies, discrepancies_key)
+        return discrepancies
 
     except Exception as e:
         print(f"Error in comparing backup data: {str(e)}")
@@ -287,11 +695,88 @@ def compare_backup_data_from_s3(zoho_backup_data_key, mongo_backup_data_key):
         )
         raise
 
+# Compare only the email buckets whose digests differ between the Zoho and MongoDB backups
+def reconcile_backups_from_s3(zoho_backup_data_key, mongo_backup_data_key, zoho_digest=None, mongo_digest=None,
+                              zoho_records=None, mongo_records=None, discrepancies_key=None):
+    """
+    Merkle-style reconciliation. The bucket digests of both backups are compared first; when they all
+    match nothing is read. Otherwise one streaming pass over each side keeps only the records in the
+    differing buckets, and only those are compared field by field.
+
+    Digests and records this run still holds are used as given; anything missing comes from the
+    backup manifests and backups in S3, so previous runs can be validated too. Backups without bucket
+    digests fall back to the full comparison.
+
+    Parameters:
+        zoho_backup_data_key (str): S3 key of the Zoho backup.
+        mongo_backup_data_key (str): S3 key of the MongoDB backup.
+        zoho_digest, mongo_digest (BucketedDigest): Digests built while extracting or backing up.
+        zoho_records, mongo_records (list): Records still in memory, read instead of the backups.
+        discrepancies_key (str): S3 key the discrepancies are written to; defaults to today's key.
+
+    Returns:
+        list: The discrepancies found.
+    """
+    if zoho_digest is None and zoho_records is not None:
+        zoho_digest, _ = index_records(zoho_records)
+    if mongo_digest is None and mongo_records is not None:
+        mongo_digest, _ = index_records(mongo_records)
+    zoho_manifest = None if zoho_digest else load_backup_manifest(zoho_backup_data_key)
+    mongo_manifest = None if mongo_digest else load_backup_manifest(mongo_backup_data_key)
+    if zoho_manifest and "buckets" in zoho_manifest:
+        zoho_digest = BucketedDigest.from_dict(zoho_manifest)
+    if mongo_manifest and "buckets" in mongo_manifest:
+        mongo_digest = BucketedDigest.from_dict(mongo_manifest)
+    if not (zoho_digest and mongo_digest) or zoho_digest.bucket_count != mongo_digest.bucket_count:
+        print("Backups without matching bucket digests, comparing full backups.")
+        return compare_backup_data_from_s3(zoho_backup_data_key, mongo_backup_data_key, discrepancies_key)
+
+    try:
+        differing_buckets = zoho_digest.differing_buckets(mongo_digest)
+        print(f"Buckets differing between Zoho and MongoDB: {len(differing_buckets)} of {zoho_digest.bucket_count}")
+        save_log_to_s3(
+            stage="Validation",
+            status="SUCCESS" if not differing_buckets else "ERROR",
+            message="Bucket digests compared",
+            record={
+                "zoho_count": zoho_digest.count,
+                "mongo_count": mongo_digest.count,
+                "differing_buckets": differing_buckets
+            }
+        )
+        if not differing_buckets:
+            report_discrepancies([], discrepancies_key)
+            return []
+
+        buckets = set(differing_buckets)
+        if zoho_records is None:
+            zoho_records = iter_backup_records(zoho_backup_data_key)
+        if mongo_records is None:
+            mongo_records = iter_backup_records(mongo_backup_data_key)
+        _, zoho_data_dict = index_records(zoho_records, buckets=buckets)
+        _, mongo_data_dict = index_records(mongo_records, buckets=buckets)
+        discrepancies = find_field_discrepancies(zoho_data_dict, mongo_data_dict)
+        report_discrepancies(discrepancies, discrepancies_key)
+        return discrepancies
+
+    except Exception as e:
+        print(f"Error in reconciling backup data: {str(e)}")
+        save_log_to_s3(
+            stage="Validation",
+            status="ERROR",
+            message="Exception during backup reconciliation",
+            error_message=str(e)
+        )
+        raise
+
 # Function to get the sns topic arn
 def get_sns_topic_arn(parameter_name):
-    try:
+    def load_parameter():
         response = ssm_client.get_parameter(Name=parameter_name)
         return response['Parameter']['Value']
+
+    try:
+        return secret_cache.get_or_load(f"parameter:{parameter_name}", load_parameter, ttl=PARAMETER_CACHE_TTL)
     except ClientError as e:
         logging.error(f"Failed to retrieve SNS Topic ARN: {e}")
         return None
@@ -313,19 +798,112 @@ def send_notification(message):
     except ClientError as e:
         logging.error(f"Failed to send notification: {e}")
 
-def load_zoho_backup_data_from_s3():
+# Load the high-water mark of the last incremental extraction
+def load_watermark_from_s3():
+    """
+    Returns the latest Zoho Modified_Time loaded by a previous incremental run, or None on the first run.
+    """
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=WATERMARK_KEY)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return json.loads(response['Body'].read().decode('utf-8')).get("modified_time")
+
+def save_watermark_to_s3(modified_time):
+    """
+    Stores the high-water mark next to the ETL status so the next incremental run starts from it.
+
+    Parameters:
+        modified_time (str): Latest Zoho Modified_Time (ISO 8601) that has been loaded.
+    """
+    watermark = {"modified_time": modified_time, "updated_at": str(datetime.now())}
+    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=WATERMARK_KEY, Body=json.dumps(watermark))
+
+# Latest Modified_Time among the leads, compared as timestamps rather than strings
+def latest_modified_time(leads, current=None):
+    latest = current
+    for lead in leads:
+        modified_time = lead.get("Modified_Time")
+        if modified_time and (latest is None or datetime.fromisoformat(modified_time) > datetime.fromisoformat(latest)):
+            latest = modified_time
+    return latest
+
+def load_zoho_backup_data_from_s3(backup_key=None):
     """Load the backup JSON data file from S3."""
-    response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=S3_KEY_BACKUP_LEADS)
+    response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=backup_key or build_s3_key_backup_leads())
     return json.loads(response['Body'].read())
 
+# Compare the records an incremental run extracted with their MongoDB documents
+def validate_changed_records(zoho_records, discrepancies_key=None, batch_size=LOAD_BATCH_SIZE):
+    """
+    An incremental extract holds only the changed leads while MongoDB holds the whole collection, so
+    dataset counts and digests can never match. Instead the MongoDB documents with the extracted
+    emails are read through the unique email index and compared field by field.
+
+    Returns:
+        list: The discrepancies found.
+    """
+    _, zoho_data_dict = index_records(zoho_records)
+    leads_collection = get_leads_collection()
+    emails = [email for email in zoho_data_dict if email]
+    mongo_documents = []
+    for start in range(0, len(emails), batch_size):
+        mongo_documents.extend(leads_collection.find(
+            {EMAIL_KEY_FIELD: {"$in": emails[start:start + batch_size]}}, LEAD_PROJECTION
+        ))
+    _, mongo_data_dict = index_records(mongo_documents)
+    print(f"Validating {len(zoho_data_dict)} changed leads against {len(mongo_data_dict)} MongoDB documents.")
+
+    discrepancies = find_field_discrepancies(zoho_data_dict, mongo_data_dict)
+    report_discrepancies(discrepancies, discrepancies_key)
+    return discrepancies
+
 # function to validate the datas in both DB
-def validate_data():
+def validate_data(zoho_backup_data_key=None, mongo_backup_data_key=None, reconcile=True,
+                  zoho_digest=None, zoho_records=None, mongo_manifest=None, discrepancies_key=None, changed_only=False):
+    """
+    Parameters:
+        zoho_backup_data_key (str): S3 key of the Zoho backup; defaults to today's.
+        mongo_backup_data_key (str): S3 key of the MongoDB backup; defaults to today's.
+        reconcile (bool): Compare only the email buckets whose digests differ instead of the full backups.
+        zoho_digest (BucketedDigest): Digest of the Zoho records built during this run's extraction.
+        zoho_records (list): Zoho records this run still holds in memory.
+        mongo_manifest (dict): Manifest returned by this run's MongoDB backup.
+        discrepancies_key (str): S3 key the discrepancies are written to; defaults to today's.
+        changed_only (bool): The Zoho side is an incremental extract; only its records are compared,
+            against their current MongoDB documents, without the dataset count and digest checks.
+
+    Without the in-run arguments both sides are read back from S3, which is how earlier runs are validated.
+    """
+    zoho_backup_data_key = zoho_backup_data_key or build_s3_key_backup_leads()
+    mongo_backup_data_key = mongo_backup_data_key or build_mongo_backup_data_key()
     try:
+        if changed_only:
+            if zoho_records is None:
+                zoho_records = iter_backup_records(zoho_backup_data_key)
+            return validate_changed_records(zoho_records, discrepancies_key)
+
+        if reconcile:
+            in_run = zoho_digest is not None or zoho_records is not None or mongo_manifest is not None
+            print("Validating backup data from this run..." if in_run else "Validating backup data from S3...")
+            mongo_digest = None
+            if mongo_manifest and "buckets" in mongo_manifest:
+                mongo_digest = BucketedDigest.from_dict(mongo_manifest)
+            return reconcile_backups_from_s3(
+                zoho_backup_data_key=zoho_backup_data_key,
+                mongo_backup_data_key=mongo_backup_data_key,
+                zoho_digest=zoho_digest,
+                mongo_digest=mongo_digest,
+                zoho_records=zoho_records,
+                discrepancies_key=discrepancies_key
+            )
+
         # Validate backup data from S3
         print("Validating backup data from S3...")
-        compare_backup_data_from_s3(
-            zoho_backup_data_key=S3_KEY_BACKUP_LEADS,
-            mongo_backup_data_key=MONGO_BACKUP_DATA_KEY
+        return compare_backup_data_from_s3(
+            zoho_backup_data_key=zoho_backup_data_key,
+            mongo_backup_data_key=mongo_backup_data_key,
+            discrepancies_key=discrepancies_key
         )
 
     except Exception as e:
@@ -339,45 +917,33 @@ def validate_data():
         raise e
     
 # Function to send metrics to cloudwatch
-# def send_metrics_to_cloudwatch(
-#     metric_name, 
-#     value, 
-#     unit=UNIT, 
-#     namespace=NAMESPACE,
-#     dimension_name=DIMENSION_NAME, 
-#     dimension_value=DIMENSION_VALUE
-# ):
-#     """
-#     Sends a custom metric to Amazon CloudWatch.
+def send_metrics_to_cloudwatch(
+    metric_name, 
+    value, 
+    unit=UNIT, 
+    namespace=NAMESPACE,
+    dimension_name=DIMENSION_NAME, 
+    dimension_value=DIMENSION_VALUE
+):
+    """
+    Records a custom metric for Amazon CloudWatch. Samples are aggregated in process and sent in
+    batches by the shared emitter, so calling this per page or per batch is cheap.
 
-#     Parameters:
-#     - metric_name (str): The name of the metric.
-#     - value (float): The value of the metric.
-#     - unit (str): The unit of the metric value (e.g., "Count", "Seconds").
-#     - namespace (str): The CloudWatch namespace for grouping metrics.
-#     - dimension_name (str): The name of the metric dimension.
-#     - dimension_value (str): The value for the metric dimension.
-#     """
-#     try:
-#         response = cloudwatch_client.put_metric_data(
-#             Namespace = namespace,
-#             MetricData=[
-#                 {
-#                     'MetricName': metric_name,
-#                     'Dimensions': [
-#                         {
-#                             'Name': dimension_name,
-#                             'Value': dimension_value
-#                         }
-#                     ],
-#                     'Value': value,
-#                     'Unit': unit
-#                 },
-#             ]
-#         )
-#         print(f"Metric {metric_name} sent to CloudWatch successfully:", response)
-#     except ClientError as e:
-#         print(f"Failed to send metric to CloudWatch: {e}")
+    Parameters:
+    - metric_name (str): The name of the metric.
+    - value (float): The value of the metric.
+    - unit (str): The unit of the metric value (e.g., "Count", "Seconds").
+    - namespace (str): The CloudWatch namespace for grouping metrics.
+    - dimension_name (str): The name of the metric dimension.
+    - dimension_value (str): The value for the metric dimension.
+    """
+    metrics.record(
+        metric_name,
+        value,
+        unit=unit,
+        dimensions={dimension_name: dimension_value},
+        namespace=namespace
+    )
 
 # Check if ETL process should run
 # def load_etl_status_from_s3():
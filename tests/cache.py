@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+from constants import SECRET_CACHE_TTL, SECRET_CACHE_ON_DISK, SECRET_CACHE_PATH
+
+class TTLCache:
+    """
+    In-process cache with a TTL per key, used for Secrets Manager and SSM lookups.
+
+    Each key has its own lock, so concurrent callers wait for a single load of the same key
+    while different keys load in parallel. With `disk_path` set, entries are also written to a
+    JSON file that a warm Lambda container (or the next process on the same host) reuses.
+
+    Parameters:
+        default_ttl (int): Seconds an entry stays valid when no per-key TTL is given.
+        disk_path (str): Optional file used to persist entries between processes.
+        clock (callable): Wall clock returning epoch seconds, injectable for tests.
+    """
+
+    def __init__(self, default_ttl=SECRET_CACHE_TTL, disk_path=None, clock=time.time):
+        self.default_ttl = default_ttl
+        self.disk_path = disk_path
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._disk_loaded = False
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Returns the cached value for `key`, calling `loader()` when it is missing or expired.
+        Exceptions from the loader propagate and nothing is cached.
+        """
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self._get(key)
+            if value is None:
+                value = loader()
+                self.set(key, value, ttl)
+            return value
+
+    def _get(self, key):
+        with self._lock:
+            if not self._disk_loaded:
+                self._load_from_disk()
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= self._clock():
+                return None
+            return entry["value"]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = {"value": value, "expires_at": self._clock() + (ttl or self.default_ttl)}
+            self._save_to_disk()
+
+    def invalidate(self, key=None):
+        """Drops one key, e.g. after its credentials were rejected, or every key when `key` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._save_to_disk()
+
+    def _load_from_disk(self):
+        self._disk_loaded = True
+        if not self.disk_path or not os.path.exists(self.disk_path):
+            return
+        try:
+            with open(self.disk_path) as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable cache file {self.disk_path}: {e}")
+            return
+        now = self._clock()
+        self._entries.update({key: entry for key, entry in entries.items() if entry["expires_at"] > now})
+
+    def _save_to_disk(self):
+        if not self.disk_path:
+            return
+        # Write owner-only and swap atomically so readers never see a partial file
+        temp_path = f"{self.disk_path}.tmp"
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(self._entries, cache_file)
+            os.replace(temp_path, self.disk_path)
+        except (OSError, TypeError, ValueError) as e:
+            # The disk copy is best-effort, like the load path; the in-memory entry stays valid
+            print(f"Could not write cache file {self.disk_path}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+# Process-wide cache for secrets and parameters
+secret_cache = TTLCache(SECRET_CACHE_TTL, disk_path=SECRET_CACHE_PATH if SECRET_CACHE_ON_DISK else None)
@@ -0,0 +1,48 @@
+REQUIRED_FIELDS = ("Last_Name", "First_Name", "Email", "Phone")
+MISSING_VALUE = "Not Found"
+
+# Compare records one at a time
+def compare_records(pairs, required_fields=REQUIRED_FIELDS):
+    """
+    Parameters:
+        pairs (iterable): (email, zoho_record, mongo_record or None) tuples.
+        required_fields (tuple): Fields compared on every record.
+
+    Returns:
+        list: Discrepancies, per email in input order and per field in `required_fields` order.
+    """
+    discrepancies = []
+    for email, zoho_record, mongo_record in pairs:
+        if not mongo_record:
+            discrepancies.append({
+                "Email": email,
+                "error": "Missing in MongoDB",
+                "zoho_record": zoho_record
+            })
+            continue
+
+        for field in required_fields:
+            zoho_value = zoho_record.get(field, MISSING_VALUE)
+            mongo_value = mongo_record.get(field, MISSING_VALUE)
+            if zoho_value != mongo_value:
+                discrepancies.append({
+                    "Email": email,
+                    "field": field,
+                    "zoho_value": zoho_value,
+                    "mongo_value": mongo_value
+                })
+    return discrepancies
+
+# Compare Zoho records against the MongoDB records with the same normalized email
+def compare_record_sets(zoho_data_dict, mongo_data_dict, required_fields=REQUIRED_FIELDS):
+    """
+    Parameters:
+        zoho_data_dict (dict): Zoho records keyed by normalized email.
+        mongo_data_dict (dict): MongoDB records keyed by normalized email.
+        required_fields (tuple): Fields compared on every record.
+
+    Returns:
+        list: Discrepancies, per email in Zoho order.
+    """
+    pairs = ((email, zoho_record, mongo_data_dict.get(email)) for email, zoho_record in zoho_data_dict.items())
+    return compare_records(pairs, required_fields)
@@ -1,12 +1,73 @@
+import threading
 import boto3
 from constants import REGION_NAME
 
+_session = None
+_session_lock = threading.Lock()
+_client_lock = threading.Lock()
+
+# One boto3 session shared by every client, so credentials and endpoint data are resolved once
+def get_boto3_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = boto3.session.Session()
+    return _session
+
 # Clients with optional dependency injection
 def get_boto3_client(service_name, region=REGION_NAME, mock_client=None):
-    return mock_client or boto3.client(service_name, region_name=region)
+    if mock_client:
+        return mock_client
+    session = get_boto3_session()
+    # Creating clients from a shared session is not thread-safe
+    with _client_lock:
+        return session.client(service_name, region_name=region)
+
+class LazyClient:
+    """
+    Stands in for a boto3 client and builds it on first use.
+
+    Importing this module no longer creates any client, so a cold start only pays for the clients
+    a run actually calls. Attribute access (`put_object`, `exceptions`, ...) is forwarded to the
+    real client, which is built once through `get_boto3_client`.
+
+    Parameters:
+        service_name (str): AWS service, e.g. "s3".
+        region (str): Region the client is created in.
+        mock_client: Client to use instead of a real one, e.g. in tests.
+    """
+
+    def __init__(self, service_name, region=REGION_NAME, mock_client=None):
+        self._service_name = service_name
+        self._region = region
+        self._client = mock_client
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = get_boto3_client(self._service_name, region=self._region)
+        return self._client
+
+    def set_client(self, client):
+        """Replaces the underlying client; None builds a fresh one on next use."""
+        with self._lock:
+            self._client = client
+
+    @property
+    def created(self):
+        return self._client is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get_client(), name)
+
+    def __repr__(self):
+        return f"LazyClient({self._service_name!r}, region={self._region!r}, created={self.created})"
 
-cloudwatch_client = get_boto3_client("cloudwatch")
-s3_client = get_boto3_client("s3")
-secrets_client = get_boto3_client("secretsmanager")
-sns_client = get_boto3_client("sns")
-ssm_client = get_boto3_client("ssm", region="ap-southeast-2")
+cloudwatch_client = LazyClient("cloudwatch")
+s3_client = LazyClient("s3")
+secrets_client = LazyClient("secretsmanager")
+sns_client = LazyClient("sns")
+ssm_client = LazyClient("ssm", region="ap-southeast-2")
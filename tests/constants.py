@@ -1,3 +1,4 @@
+import os
 from s3_key_builders import (
     build_count_discrepancies_key,
     build_data_discrepancies_key,
@@ -8,7 +9,7 @@ from s3_key_builders import (
 SECRET_NAME = "zohocrmmig"  
 DATABASE = "zoho_crm"  
 COLLECTION_NAME = "leads"  
-UNIT = "count"  
+UNIT = "Count"  # CloudWatch units are case-sensitive
 
 NAMESPACE = "zohocrm_mongodb_migration"  
 DIMENSION_NAME = "migrationproject"  
@@ -19,19 +20,66 @@ CA_EC2_BUNDLE_PATH = "/home/ubuntu/etl/global-bundle.pem"
 CA_LAMBDA_BUNDLE_PATH = "/tmp/global-bundle.pem"
 CA_CERTIFICATE_BASE_URL = "https://truststore.pki.rds.amazonaws.com"
 CA_CERTIFICATE_REGION = "global"
+CA_BUNDLE_TTL = 7 * 24 * 3600  # Seconds a downloaded CA bundle is reused before it is fetched again
+CA_PACKAGED_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "global-bundle.pem")  # Optional copy shipped with the deployment artifact
 
 CLUSTER_IDENTIFIER = "docdb-cluster"
 NUM_FETCH_DATA = 4000
+FETCH_CONCURRENCY = 4  # Zoho pages requested in parallel during extraction
+ZOHO_REQUESTS_PER_SECOND = 10  # Zoho requests per second shared by every module extracted in parallel
+ZOHO_REQUEST_BURST = 10  # Requests that may start at once when the shared budget is full
+MODULE_CONCURRENCY = 4  # Zoho modules migrated in parallel
+ZOHO_PAGE_SIZE = 200  # Maximum records Zoho returns per page
+MONGO_MAX_POOL_SIZE = 10  # Connections the shared DocumentDB client may open
+MONGO_MIN_POOL_SIZE = 1  # Connections kept warm between stages and warm Lambda invocations
+MONGO_MAX_IDLE_TIME_MS = 300000  # Idle connections are closed after five minutes
+LOAD_BATCH_SIZE = 500  # Leads per unordered bulk_write during the incremental load
+EMAIL_KEY_FIELD = "_email_key"  # Normalized email stored on each lead, backed by a unique index
+RECORD_KEY_FIELD = "_record_key"  # Normalized key of non-lead module records, backed by a unique index
+CONTENT_HASH_FIELD = "_content_hash"  # Hash of the lead's Zoho fields, used to skip unchanged writes
+LEAD_PROJECTION = {"_id": 0, EMAIL_KEY_FIELD: 0, CONTENT_HASH_FIELD: 0}  # Internal fields left out of reads and backups
+RECONCILIATION_BUCKETS = 256  # Email buckets whose digests are stored with each backup for reconciliation
+CHECKPOINT_PAGES = 5  # Zoho pages per staged part in a resumable extraction
+CHECKPOINT_MAX_AGE_SECONDS = 6 * 3600  # Older checkpoints are discarded; Zoho page offsets shift as records change
+PIPELINE_QUEUE_SIZE = 4  # Pages buffered between the extractor and the loader in streaming mode
+ETL_MODES = ("batch", "resumable", "streaming")  # Modes accepted by etl.main and the Lambda handler
+LOG_FLUSH_ENTRIES = 500  # Log entries per NDJSON object shipped to S3
+LOG_FLUSH_BYTES = 1024 * 1024  # Ship the log batch once it reaches this size
+LOG_FLUSH_INTERVAL = 5  # Seconds a log entry may wait before its batch is shipped
+LOG_QUEUE_SIZE = 10000  # Entries buffered for the log shipper; further entries are dropped, never blocking the ETL
+METRICS_FLUSH_INTERVAL = 60  # Seconds between CloudWatch flushes of the aggregated metrics
+METRICS_MAX_DATUMS_PER_REQUEST = 1000  # CloudWatch PutMetricData limit
+PROFILE_STAGES = os.environ.get("ETL_PROFILE_STAGES") == "1"  # Run each stage under cProfile and tracemalloc
+TRACE_SUB_SPANS = os.environ.get("ETL_TRACE_SUB_SPANS") == "1"  # Keep per-page and per-batch spans in the timing report
+PROFILE_TOP_STATS = 40  # Functions and allocation sites kept in each stage profile
+HTTP_POOL_CONNECTIONS = 4  # Hosts to keep connection pools for (Zoho API, Zoho accounts, CA truststore)
+HTTP_POOL_MAXSIZE = 16  # Keep-alive connections per host; must cover MODULE_CONCURRENCY * FETCH_CONCURRENCY
+HTTP_CONNECT_TIMEOUT = 5  # Seconds
+HTTP_READ_TIMEOUT = 60  # Seconds
+TOKEN_REFRESH_MARGIN = 300  # Seconds before expires_in at which the Zoho access token is renewed
+ZOHO_TOKEN_DEFAULT_EXPIRES_IN = 3600  # Seconds, used when Zoho omits expires_in
+SECRET_CACHE_TTL = 900  # Seconds a Secrets Manager secret is reused before being read again
+PARAMETER_CACHE_TTL = 3600  # Seconds an SSM parameter is reused before being read again
+SECRET_CACHE_ON_DISK = False  # Persist the cache so warm Lambda containers skip the lookups
+SECRET_CACHE_PATH = "/tmp/zoho_etl_secret_cache.json"
+S3_MULTIPART_PART_SIZE = 8 * 1024 * 1024  # S3 requires at least 5 MiB for every part but the last
+S3_UPLOAD_WORKERS = 4  # Multipart parts uploaded in parallel by streaming backups
+PARQUET_BACKUP_ENABLED = False  # Also write Parquet copies of the streamed backups (needs pyarrow)
+PARQUET_ROW_GROUP_SIZE = 10000  # Records per Parquet row group
+MONGO_BACKUP_BATCH_SIZE = 1000  # Documents fetched per cursor round trip during the streaming backup
+BACKUP_READ_CHUNK_SIZE = 1024 * 1024  # Bytes read at a time when streaming a JSON array backup back from S3
 S3_BUCKET_NAME = "zoho-mig-mgdb-cf-log"
 STATUS_KEY = "etl_status/elt_status.JSON"
+WATERMARK_KEY = "etl_status/zoho_watermark.json"  # Latest Modified_Time loaded by an incremental run
 
-# S3 Keys generated dynamically
+# S3 Keys generated dynamically; these are dated at import, so ETL runs build their own with build_run_keys()
 COUNT_DISCREPANCIES_KEY = build_count_discrepancies_key()
 DATA_DISCREPANCIES_KEY = build_data_discrepancies_key()
 S3_KEY_BACKUP_LEADS = build_s3_key_backup_leads()
 MONGO_BACKUP_DATA_KEY = build_mongo_backup_data_key()
 
-ZOHO_BASE_URL = "https://www.zohoapis.com.au/crm/v2/Leads"
+ZOHO_API_BASE_URL = "https://www.zohoapis.com.au/crm/v2"  # Module records live under <base>/<module>
+ZOHO_BASE_URL = f"{ZOHO_API_BASE_URL}/Leads"
 ZOHO_CRM_CREDENTIAL = "zoho_crm_credentials"  
 ZOHO_REFRESH_TOKEN = "ZOHO_REFRESH_TOKEN"
 ZOHO_CLIENT_ID = "ZOHO_CLIENT_ID"
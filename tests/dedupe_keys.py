@@ -0,0 +1,27 @@
+"""
+One-off migration for collections loaded before the unique key index existed.
+
+Lists the documents that share a normalized key and, with --apply, backs them up to S3 and removes
+all but the most recently inserted one per key, so the unique index can be created.
+
+    python dedupe_keys.py Leads            # dry run
+    python dedupe_keys.py Leads --apply
+"""
+import argparse
+import json
+from utils import get_module_collection, remove_duplicate_keys
+from zoho_modules import ZOHO_MODULES, get_zoho_module
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove documents sharing a normalized key before indexing.")
+    parser.add_argument("module", choices=list(ZOHO_MODULES), help="Zoho module whose collection is migrated")
+    parser.add_argument("--apply", action="store_true", help="Back up and delete the duplicates instead of listing them")
+    args = parser.parse_args(argv)
+
+    module = get_zoho_module(args.module)
+    report = remove_duplicate_keys(get_module_collection(module), module, dry_run=not args.apply)
+    print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+from constants import LEAD_PROJECTION, RECONCILIATION_BUCKETS
+
+DIGEST_BITS = 128
+_DIGEST_MODULUS = 1 << DIGEST_BITS
+
+# Leads are matched across Zoho and MongoDB on their trimmed, lower-cased email
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+# Reconciliation bucket of a lead, derived from a hash of its normalized email
+def email_bucket(email, bucket_count=RECONCILIATION_BUCKETS):
+    email_hash = hashlib.blake2b(normalize_email(email).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(email_hash, "big") % bucket_count
+
+# Canonical encoding of one record, independent of key order and of MongoDB/internal fields
+def canonical_record(record):
+    fields = {field: value for field, value in record.items() if field not in LEAD_PROJECTION}
+    return json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+# BLAKE2b hash of one record as an integer
+def record_hash(record):
+    return int.from_bytes(hashlib.blake2b(canonical_record(record), digest_size=DIGEST_BITS // 8).digest(), "big")
+
+class DatasetDigest:
+    """
+    Order-independent digest of a collection of records.
+
+    Each record is hashed on its own and the hashes are added modulo 2**128, so the result does not
+    depend on the order records are read or written in, can be updated one record at a time, and
+    digests of separate chunks can be merged. Duplicate records still change the digest.
+    """
+
+    def __init__(self, count=0, value=0):
+        self.count = count
+        self.value = value
+
+    def update(self, record):
+        self.value = (self.value + record_hash(record)) % _DIGEST_MODULUS
+        self.count += 1
+
+    def update_many(self, records):
+        for record in records:
+            self.update(record)
+
+    def merge(self, other):
+        self.value = (self.value + other.value) % _DIGEST_MODULUS
+        self.count += other.count
+
+    def hexdigest(self):
+        return f"{self.value:0{DIGEST_BITS // 4}x}"
+
+    def to_dict(self):
+        return {"record_count": self.count, "digest": self.hexdigest()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(count=data["record_count"], value=int(data["digest"], 16))
+
+    def __eq__(self, other):
+        return isinstance(other, DatasetDigest) and (self.count, self.value) == (other.count, other.value)
+
+class BucketedDigest(DatasetDigest):
+    """
+    Dataset digest that also keeps one digest per email bucket, the leaves of a one-level Merkle tree.
+
+    Two backups whose bucket digests match hold the same records in that bucket, so reconciliation
+    only has to compare the records of the buckets that differ.
+    """
+
+    def __init__(self, bucket_count=RECONCILIATION_BUCKETS, count=0, value=0, buckets=None):
+        super().__init__(count=count, value=value)
+        self.bucket_count = bucket_count
+        self.buckets = buckets or {}
+
+    def update(self, record):
+        super().update(record)
+        bucket = email_bucket(record.get("Email"), self.bucket_count)
+        self.buckets.setdefault(bucket, DatasetDigest()).update(record)
+
+    def merge(self, other):
+        if other.bucket_count != self.bucket_count:
+            raise ValueError(f"Cannot merge digests with {self.bucket_count} and {other.bucket_count} buckets")
+        super().merge(other)
+        for bucket, digest in other.buckets.items():
+            self.buckets.setdefault(bucket, DatasetDigest()).merge(digest)
+
+    def differing_buckets(self, other):
+        """
+        Returns the sorted bucket numbers whose digests differ between the two datasets.
+        """
+        if other.bucket_count != self.bucket_count:
+            raise ValueError(f"Cannot compare digests with {self.bucket_count} and {other.bucket_count} buckets")
+        empty = DatasetDigest()
+        return sorted(
+            bucket for bucket in set(self.buckets) | set(other.buckets)
+            if self.buckets.get(bucket, empty) != other.buckets.get(bucket, empty)
+        )
+
+    def to_dict(self):
+        return dict(
+            super().to_dict(),
+            bucket_count=self.bucket_count,
+            buckets={str(bucket): digest.to_dict() for bucket, digest in sorted(self.buckets.items())}
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            bucket_count=data["bucket_count"],
+            count=data["record_count"],
+            value=int(data["digest"], 16),
+            buckets={int(bucket): DatasetDigest.from_dict(digest) for bucket, digest in data["buckets"].items()}
+        )
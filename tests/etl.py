@@ -1,45 +1,155 @@
 import json
+import queue
+import threading
 import time
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pymongo import UpdateOne
 from utils import *
 from constants import *
 from config import *
+from s3_stream import S3JsonArrayWriter
+from s3_key_builders import build_run_keys, build_s3_key_backup_leads, build_extraction_staging_prefix
+from checkpoint import ExtractionCheckpoint
+from parquet_backup import ParquetBackupWriter
+from digests import BucketedDigest
+from http_session import get_http_session
+from rate_limit import TokenBucket
+from zoho_modules import LEADS_MODULE, get_zoho_module
 
-# Fetch Zoho leads
-def fetch_leads(max_records=10000):
+# Build the headers and query parameters for Zoho requests of one module
+def build_module_request(module, modified_since=None):
+    """
+    Parameters:
+        module (ZohoModule): Module whose fields are requested.
+        modified_since (str): Optional ISO 8601 watermark; only records modified after it are requested,
+            oldest change first, so a capped run never skips changes it did not reach.
+    """
     access_token = get_access_token()
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    leads, page, per_page = [], 1, 200
-    params = {"fields": "First_Name,Last_Name,Email,Phone,Company,Industry,Lead_Status", 
-              "per_page": per_page}
-
-    while len(leads) < max_records:
-        params["page"] = page
-        response = requests.get(ZOHO_BASE_URL, headers=headers, params=params)
-        data = response.json()
-        if 'data' in data:
-            leads.extend(data['data'])
-            # send_metrics_to_cloudwatch("RecordsProcessed", len(data["data"]))
-            page += 1
-
-            # Stop if max_records is reached
-            if len(leads) >= max_records:
-                leads = leads[:max_records]
-                break
+    params = {"fields": ",".join(module.fields), "per_page": ZOHO_PAGE_SIZE}
+    if modified_since:
+        headers["If-Modified-Since"] = modified_since
+        params.update({"sort_by": "Modified_Time", "sort_order": "asc"})
+    return headers, params
+
+# Build the headers and query parameters for Zoho lead requests
+def build_lead_request(modified_since=None):
+    return build_module_request(LEADS_MODULE, modified_since)
+
+# Fetch a single page of Zoho leads
+def fetch_page(page, headers, params, http=None, url=None, rate_limiter=None):
+    """
+    Fetches one page of leads from Zoho CRM, retrying the same page when rate limited.
+
+    Parameters:
+        page (int): Page number to request.
+        headers (dict): Request headers; the OAuth token is taken from the token cache on every attempt.
+        params (dict): Query parameters shared by every page.
+        http (requests.Session): Session used for the request; defaults to the shared pooled session.
+        url (str): Module endpoint; defaults to the Leads endpoint.
+        rate_limiter (TokenBucket): Request budget shared with other modules; a 429 pauses all of them.
+
+    Returns:
+        list: Leads on the page, or an empty list once Zoho has no more records.
+    """
+    http = http or get_http_session()
+    page_params = dict(params, page=page)
+    token_rejected = False
+    while True:
+        access_token = get_access_token()
+        request_headers = dict(headers, Authorization=f"Zoho-oauthtoken {access_token}")
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        response = http.get(url or ZOHO_BASE_URL, headers=request_headers, params=page_params)
+
+        # Refresh an expired or revoked token once and retry the same page
+        if response.status_code == 401:
+            if token_rejected:
+                raise Exception(f"Zoho rejected a freshly issued access token on page {page}")
+            invalidate_access_token(access_token)
+            token_rejected = True
+            continue
 
         # Check for rate limiting error
-        elif response.status_code == 429:
+        if response.status_code == 429:
             retry_after = int(response.headers.get("Retry-After", 60))  # Default retry after 60 seconds if header is missing
-            print(f"Rate limit reached. Waiting for {retry_after} seconds before retrying...")
-            time.sleep(retry_after)
+            print(f"Rate limit reached on page {page}. Waiting for {retry_after} seconds before retrying...")
+            if rate_limiter is not None:
+                rate_limiter.pause(retry_after)
+            else:
+                time.sleep(retry_after)
             continue  # Retry the same page after waiting
-        
-        else:
-            break
+
+        # Zoho answers 204 with an empty body once the pages run out, 304 when nothing changed since the watermark
+        if response.status_code in (204, 304):
+            return []
+        return response.json().get("data", [])
+
+# Yield Zoho lead pages in page order
+def iter_lead_pages(headers, params, max_records, concurrency=FETCH_CONCURRENCY, first_page=1, url=None, rate_limiter=None):
+    """
+    Fetches lead pages with up to `concurrency` requests in flight and yields them in page order.
+    Stops at the first empty page or once enough pages for `max_records` have been requested.
+
+    Parameters:
+        headers (dict): Request headers including the OAuth token.
+        params (dict): Query parameters, including `per_page`.
+        max_records (int): Upper bound on the number of records needed, counted from page 1.
+        concurrency (int): Number of pages fetched at once.
+        first_page (int): Page to start from, used when resuming a checkpointed extraction.
+        url (str): Module endpoint; defaults to the Leads endpoint.
+        rate_limiter (TokenBucket): Request budget shared with other modules.
+    """
+    last_page = -(-max_records // params["per_page"])
+    pending, next_page = {}, first_page
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    def fetch(page):
+        with tracer.span("Zoho page", page=page):
+            return fetch_page(page, headers, params, url=url, rate_limiter=rate_limiter)
+
+    try:
+        for page in range(first_page, last_page + 1):
+            # Keep the window of in-flight pages full
+            while next_page <= last_page and len(pending) < concurrency:
+                pending[next_page] = executor.submit(fetch, next_page)
+                next_page += 1
+
+            records = pending.pop(page).result()
+            if not records:
+                break
+            yield records
+    finally:
+        for future in pending.values():
+            future.cancel()
+        executor.shutdown(wait=True)
+
+# Fetch Zoho leads
+def fetch_leads(max_records=10000, concurrency=FETCH_CONCURRENCY, modified_since=None, backup_key=None, digest=None):
+    """
+    Parameters:
+        digest (BucketedDigest): Digest the extracted leads are added to, so validation can reuse it
+            instead of hashing the leads again; a new one is used when not given.
+
+    Returns:
+        list: The extracted leads.
+    """
+    backup_key = backup_key or build_s3_key_backup_leads()
+    digest = digest if digest is not None else BucketedDigest()
+    headers, params = build_lead_request(modified_since)
+    leads, started = [], time.perf_counter()
+    for records in iter_lead_pages(headers, params, max_records, concurrency):
+        # Stop if max_records is reached
+        records = records[:max_records - len(leads)]
+        leads.extend(records)
+        digest.update_many(records)
+        metrics.increment("PagesFetched")
+    record_throughput("Extraction", len(leads), started)
 
     # Save leads to S3
-    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=S3_KEY_BACKUP_LEADS, Body=json.dumps(leads))
+    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=backup_key, Body=json.dumps(leads))
+    save_backup_manifest(backup_key, digest, format="json")
     save_log_to_s3({
         "stage": "Extraction", 
         "timestamp": str(datetime.now()), 
@@ -48,31 +158,384 @@ def fetch_leads(max_records=10000):
     
     return leads
 
-# Incremental load new data into MongoDB
-def incremental_load(leads):
-    existing_emails = get_mongo_leads().keys()
-    new_leads = [lead for lead in leads if lead.get("Email") not in existing_emails]
+# Fetch Zoho leads with page checkpoints in S3 so a crashed run can resume
+def fetch_leads_resumable(max_records=10000, concurrency=FETCH_CONCURRENCY, modified_since=None,
+                          checkpoint_pages=CHECKPOINT_PAGES, backup_key=None, digest=None):
+    """
+    Same result as fetch_leads, but every `checkpoint_pages` pages are committed to the S3 staging
+    prefix with a manifest. The prefix is derived from the watermark and record cap, so a restarted
+    run with the same extraction resumes after the last committed page instead of page 1, then
+    stitches the Zoho backup from the staged parts. Only unfinished checkpoints younger than
+    CHECKPOINT_MAX_AGE_SECONDS are resumed; anything else is cleared and extracted again, as old
+    page offsets no longer line up with Zoho's current list. `digest`, when given, receives the
+    digest of the stitched backup.
 
-    leads_collection = get_leads_collection()
-    
-    if new_leads:
-        leads_collection.insert_many(new_leads)
-        save_log_to_s3(
-            stage="Incremental Load",
-            status="SUCCESS",
-            message=f"Inserted {len(new_leads)} new leads into DocumentDB",
-            record={"inserted_leads_count": len(new_leads)}
+    Returns:
+        list: The extracted leads.
+    """
+    backup_key = backup_key or build_s3_key_backup_leads()
+    checkpoint = ExtractionCheckpoint(build_extraction_staging_prefix(modified_since, max_records))
+    manifest = checkpoint.load(modified_since, max_records)
+
+    if manifest["last_page"]:
+        print(f"Resuming extraction after page {manifest['last_page']} ({manifest['record_count']} records staged).")
+    headers, params = build_lead_request(modified_since)
+    batch, batch_first_page = [], manifest["last_page"] + 1
+    page = manifest["last_page"]
+    for page, records in enumerate(
+        iter_lead_pages(headers, params, max_records, concurrency, first_page=batch_first_page),
+        start=batch_first_page
+    ):
+        batch.extend(records)
+        if page - batch_first_page + 1 >= checkpoint_pages:
+            checkpoint.commit_part(batch_first_page, page, batch)
+            batch, batch_first_page = [], page + 1
+    if batch:
+        checkpoint.commit_part(batch_first_page, page, batch)
+    checkpoint.mark_complete()
+
+    # Stitch the final backup from the staged parts one part at a time
+    leads = []
+    with S3JsonArrayWriter(S3_BUCKET_NAME, backup_key) as backup:
+        for records in checkpoint.iter_parts():
+            records = records[:max_records - len(leads)]
+            backup.write_records(records)
+            leads.extend(records)
+    save_backup_manifest(backup_key, backup.digest, format="json")
+    if digest is not None:
+        digest.merge(backup.digest)
+
+    save_log_to_s3(
+        stage="Extraction",
+        status="SUCCESS",
+        message="Data fetched with checkpoints",
+        record={"record_count": len(leads), "staged_parts": len(manifest["parts"])}
+    )
+    return leads
+
+# Remove the staged pages of a resumable extraction once they are loaded
+def clear_extraction_checkpoint(modified_since=None, max_records=10000):
+    ExtractionCheckpoint(build_extraction_staging_prefix(modified_since, max_records)).clear()
+
+# Upsert one batch of module records keyed by their normalized key
+def upsert_records(collection, records, module):
+    """
+    Writes a batch of records with one unordered bulk_write of UpdateOne(..., upsert=True) operations
+    matched on the module's unique key index, so the cost depends on the batch, not the collection.
+    Each record carries a content hash; records whose stored hash is identical are not written at all.
+    Records without a key cannot be matched and are skipped.
+
+    Returns:
+        dict: Counts of inserted, updated, unchanged and skipped records.
+    """
+    key_store_field = module.key_store_field
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    documents = {}
+    for record in records:
+        record_key = module.record_key(record)
+        if not record_key:
+            counts["skipped"] += 1
+            continue
+        # Within a batch the last occurrence of a key wins, as it would across batches
+        document = {field: value for field, value in record.items() if field != "_id"}
+        document[key_store_field] = record_key
+        document[CONTENT_HASH_FIELD] = calculate_record_hash(record)
+        documents[record_key] = document
+
+    # Drop records whose content has not changed since they were last written
+    if documents:
+        stored = collection.find(
+            {key_store_field: {"$in": list(documents)}}, {"_id": 0, key_store_field: 1, CONTENT_HASH_FIELD: 1}
         )
-    else:
-        save_log_to_s3(
-            stage="Incremental Load",
-            status="SUCCESS",
-            message="No new leads to insert",
-            record={"new_leads_count": 0}
+        for existing in stored:
+            document = documents.get(existing[key_store_field])
+            if document is not None and existing.get(CONTENT_HASH_FIELD) == document[CONTENT_HASH_FIELD]:
+                del documents[existing[key_store_field]]
+                counts["unchanged"] += 1
+
+    if documents:
+        result = collection.bulk_write(
+            [UpdateOne({key_store_field: key}, {"$set": doc}, upsert=True) for key, doc in documents.items()],
+            ordered=False
         )
+        counts["inserted"] = result.upserted_count
+        counts["updated"] = result.modified_count
+        counts["unchanged"] += result.matched_count - result.modified_count
+    return counts
+
+# Upsert one batch of leads keyed by normalized email
+def upsert_leads(leads_collection, leads):
+    return upsert_records(leads_collection, leads, LEADS_MODULE)
+
+# Incremental load new data into MongoDB
+def incremental_load(leads, batch_size=LOAD_BATCH_SIZE):
+    """
+    Upserts the leads into DocumentDB in batches of `batch_size`.
+
+    Returns:
+        dict: Counts of inserted, updated, unchanged and skipped leads.
+    """
+    leads_collection = get_leads_collection()
+    ensure_leads_indexes(leads_collection)
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    started = time.perf_counter()
+    for start in range(0, len(leads), batch_size):
+        with tracer.span("Load batch", start=start), metrics.timer("BatchLatency", dimensions={"Stage": "Incremental Load"}):
+            batch_counts = upsert_leads(leads_collection, leads[start:start + batch_size])
+        for name, count in batch_counts.items():
+            counts[name] += count
+    record_throughput("Incremental Load", len(leads), started)
+
+    save_log_to_s3(
+        stage="Incremental Load",
+        status="SUCCESS",
+        message=f"Inserted {counts['inserted']} new leads and updated {counts['updated']} leads in DocumentDB",
+        record=counts
+    )
+    return counts
+
+# Stream leads from Zoho into MongoDB and the S3 backup page by page
+def run_streaming_pipeline(max_records=NUM_FETCH_DATA, concurrency=FETCH_CONCURRENCY, queue_size=PIPELINE_QUEUE_SIZE,
+                           modified_since=None, parquet=PARQUET_BACKUP_ENABLED, backup_key=None, run_date=None):
+    """
+    Runs extraction and incremental load as a pipeline without building the full lead list.
+    An extractor thread pushes Zoho pages into a bounded queue; the loader writes each page to the
+    streaming S3 backup and upserts it into MongoDB. When the queue is full the extractor
+    blocks, so peak memory stays at a few pages regardless of the total record count.
+
+    Parameters:
+        max_records (int): Maximum number of leads to extract.
+        concurrency (int): Number of Zoho pages fetched at once.
+        queue_size (int): Number of pages buffered between extractor and loader.
+        modified_since (str): Optional watermark; only leads modified after it are extracted.
+        parquet (bool): Also write the Zoho backup as partitioned Parquet.
+        backup_key (str): S3 key of the Zoho backup; defaults to today's.
+        run_date (datetime): Start of the run, used as the Parquet partition date; defaults to now.
+
+    Returns:
+        dict: Extracted record count, load counts and the latest Modified_Time loaded.
+    """
+    backup_key = backup_key or build_s3_key_backup_leads()
+    pages = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    # Block while the loader is behind, but give up once it has stopped
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def extract():
+        try:
+            headers, params = build_lead_request(modified_since)
+            fetched = 0
+            for records in iter_lead_pages(headers, params, max_records, concurrency):
+                records = records[:max_records - fetched]
+                fetched += len(records)
+                put(records)
+                if stop.is_set() or fetched >= max_records:
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # The end-of-pages marker also waits for room, so a loader that failed meanwhile is not blocked on
+            put(None)
+
+    leads_collection = get_leads_collection()
+    ensure_leads_indexes(leads_collection)
+    backup = S3JsonArrayWriter(S3_BUCKET_NAME, backup_key)
+    parquet_backup = ParquetBackupWriter("zoho-backup", date=run_date) if parquet else None
+    extractor = threading.Thread(target=extract, name="zoho-extractor", daemon=True)
+    record_count, started = 0, time.perf_counter()
+    load_counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    watermark = modified_since
+    extractor.start()
+    try:
+        while True:
+            records = pages.get()
+            if records is None:
+                break
+            backup.write_records(records)
+            if parquet_backup:
+                parquet_backup.write_records(records)
+            with tracer.span("Load batch", records=len(records)):
+                batch_counts = upsert_leads(leads_collection, records)
+            for name, count in batch_counts.items():
+                load_counts[name] += count
+            record_count += len(records)
+            watermark = latest_modified_time(records, watermark)
+        if errors:
+            raise errors[0]
+        backup.close()
+        if parquet_backup:
+            parquet_backup.close()
+        save_backup_manifest(backup_key, backup.digest, format="json")
+    except Exception:
+        stop.set()
+        backup.abort()
+        if parquet_backup:
+            parquet_backup.abort()
+        raise
+    finally:
+        extractor.join()
+
+    record_throughput("Streaming Pipeline", record_count, started)
+    summary = dict(load_counts, record_count=record_count)
+    save_log_to_s3(
+        stage="Streaming Pipeline",
+        status="SUCCESS",
+        message=f"Streamed {record_count} leads, inserted {load_counts['inserted']} and updated {load_counts['updated']} in DocumentDB",
+        record=summary
+    )
+    return dict(summary, watermark=watermark, zoho_digest=backup.digest)
+
+# Fetch every record of one Zoho module and back the extract up to S3
+def fetch_module_records(module, max_records=NUM_FETCH_DATA, concurrency=FETCH_CONCURRENCY, rate_limiter=None):
+    """
+    Parameters:
+        module (ZohoModule): Module to extract.
+        max_records (int): Maximum number of records extracted.
+        concurrency (int): Pages of this module fetched at once.
+        rate_limiter (TokenBucket): Request budget shared with the other modules of the run.
+
+    Returns:
+        list: The module's records.
+    """
+    headers, params = build_module_request(module)
+    records, digest, started = [], BucketedDigest(), time.perf_counter()
+    for page_records in iter_lead_pages(headers, params, max_records, concurrency, url=module.url, rate_limiter=rate_limiter):
+        page_records = page_records[:max_records - len(records)]
+        records.extend(page_records)
+        digest.update_many(page_records)
+        metrics.increment("PagesFetched", dimensions={"Module": module.name})
+    record_throughput(f"{module.name} Extraction", len(records), started)
+
+    backup_key = module.backup_key()
+    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=backup_key, Body=json.dumps(records))
+    save_backup_manifest(backup_key, digest, format="json", module=module.name)
+    save_log_to_s3(
+        stage="Extraction",
+        status="SUCCESS",
+        message=f"Fetched {len(records)} {module.name} records from Zoho CRM",
+        record={"module": module.name, "record_count": len(records)}
+    )
+    return records
+
+# Upsert one module's records into its DocumentDB collection
+def load_module_records(module, records, batch_size=LOAD_BATCH_SIZE):
+    """
+    Returns:
+        dict: Counts of inserted, updated, unchanged and skipped records.
+    """
+    collection = get_module_collection(module)
+    ensure_record_indexes(collection, module)
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    started = time.perf_counter()
+    for start in range(0, len(records), batch_size):
+        with tracer.span("Load batch", module=module.name, start=start), \
+                metrics.timer("BatchLatency", dimensions={"Stage": "Incremental Load", "Module": module.name}):
+            batch_counts = upsert_records(collection, records[start:start + batch_size], module)
+        for name, count in batch_counts.items():
+            counts[name] += count
+    record_throughput(f"{module.name} Incremental Load", len(records), started)
+
+    save_log_to_s3(
+        stage="Incremental Load",
+        status="SUCCESS",
+        message=f"Inserted {counts['inserted']} new and updated {counts['updated']} {module.name} records in DocumentDB",
+        record=dict(counts, module=module.name)
+    )
+    return counts
+
+# Extract one module from Zoho and load it into DocumentDB
+def migrate_module(module, max_records=NUM_FETCH_DATA, concurrency=FETCH_CONCURRENCY, rate_limiter=None):
+    with tracer.span(module.name, detail=False, kind="module"):
+        records = fetch_module_records(module, max_records, concurrency, rate_limiter)
+        counts = load_module_records(module, records)
+    return dict(counts, record_count=len(records), collection=module.collection)
+
+# Migrate several Zoho modules in parallel under one request budget
+def migrate_modules(module_names, max_records=NUM_FETCH_DATA, concurrency=MODULE_CONCURRENCY,
+                    page_concurrency=FETCH_CONCURRENCY, rate_limiter=None):
+    """
+    Runs `migrate_module` for each module on its own thread. All modules draw from one TokenBucket,
+    so together they stay under the Zoho API limit, and a 429 on any of them pauses every module.
+
+    Parameters:
+        module_names (list): Zoho API names, e.g. ["Contacts", "Deals"].
+        max_records (int): Maximum number of records extracted per module.
+        concurrency (int): Modules migrated at once.
+        page_concurrency (int): Pages fetched at once within each module.
+        rate_limiter (TokenBucket): Shared request budget; a new one is created when not given.
+
+    Returns:
+        dict: Per-module summary keyed by module name.
+
+    Raises:
+        Exception: When any module failed, after the other modules have finished.
+    """
+    modules = [get_zoho_module(name) for name in module_names]
+    rate_limiter = rate_limiter or TokenBucket()
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(modules)))) as executor:
+        futures = {
+            module.name: executor.submit(migrate_module, module, max_records, page_concurrency, rate_limiter)
+            for module in modules
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+                save_log_to_s3(
+                    stage="Module Migration",
+                    status="ERROR",
+                    message=f"Migrating Zoho {name} failed",
+                    error_message=str(e)
+                )
+    if errors:
+        raise Exception(f"Failed to migrate Zoho modules: {errors}")
+    return results
 
 # Main entry point for the ETL process
-def main():
+def main(mode="batch", incremental=False, profile=None, max_records=NUM_FETCH_DATA, run_id=None, modules=None):
+    """
+    Runs the ETL.
+
+    Parameters:
+        mode (str): "batch" loads the full extracted list; "resumable" does the same with S3 page
+            checkpoints; "streaming" pipes pages straight into MongoDB and streams the MongoDB backup.
+        incremental (bool): Only extract leads modified since the watermark stored in S3.
+        profile (bool): Run each stage under cProfile and tracemalloc; defaults to PROFILE_STAGES.
+        max_records (int): Maximum number of leads extracted from Zoho CRM.
+        run_id (str): ID grouping the run's logs and timing report; generated when not given.
+        modules (list): Zoho modules to migrate; defaults to Leads. Any other selection migrates the modules
+            in parallel in batch mode, without the Leads watermark, backup and validation steps.
+
+    Returns:
+        dict: Run summary with record and load counts, discrepancies, watermark and stage timings.
+    """
+    if mode not in ETL_MODES:
+        raise ValueError(f"Unknown ETL mode {mode!r}; expected one of {', '.join(ETL_MODES)}")
+    module_names = list(modules or [LEADS_MODULE.name])
+    for name in module_names:
+        get_zoho_module(name)
+    multi_module = module_names != [LEADS_MODULE.name]
+    if multi_module and (mode != "batch" or incremental):
+        raise ValueError("Migrating modules other than Leads only supports the non-incremental batch mode")
+    # Dated keys are fixed at the start of the run, so a warm container or a run crossing midnight
+    # never writes into another day's backups or logs
+    started_at = datetime.now()
+    run_id = log_shipper.start_run(run_id, started_at=started_at)
+    tracer.start_run(run_id, profile=profile, started_at=started_at)
+    keys = build_run_keys(started_at)
+    summary = {"run_id": run_id, "mode": mode, "incremental": incremental}
     try:
         # Start of ETL
         print("ETL process started.")
@@ -82,24 +545,102 @@ def main():
             message="Starting ETL process"
         )
 
-        # Step 1: Fetch data from Zoho CRM
-        print("Fetching leads data from Zoho CRM...")
-        leads = fetch_leads(NUM_FETCH_DATA)
-        print(f"Fetched {len(leads)} records from Zoho CRM.")
+        if multi_module:
+            print(f"Migrating Zoho modules {', '.join(module_names)} to MongoDB...")
+            with tracer.stage("Module Migration"):
+                module_summaries = migrate_modules(module_names, max_records)
+            save_log_to_s3(
+                stage="ETL Success",
+                status="SUCCESS",
+                message="ETL process completed successfully",
+                record=module_summaries
+            )
+            print("ETL process completed successfully.")
+            summary.update(
+                status="SUCCESS",
+                modules=module_summaries,
+                record_count=sum(result["record_count"] for result in module_summaries.values()),
+                load_counts={
+                    name: sum(result[name] for result in module_summaries.values())
+                    for name in ("inserted", "updated", "unchanged", "skipped")
+                },
+                discrepancy_count=None,
+                watermark=None,
+                stages_ms=tracer.report()["stages_ms"]
+            )
+            return summary
+
+        watermark = None
+        if incremental:
+            watermark = load_watermark_from_s3()
+            print(f"Extracting leads modified since {watermark or 'the beginning'}.")
+
+        if mode == "streaming":
+            # Steps 1-2: Stream Zoho pages straight into MongoDB and the S3 backup
+            print("Streaming leads data from Zoho CRM to MongoDB...")
+            with tracer.stage("Streaming Pipeline"):
+                pipeline_summary = run_streaming_pipeline(max_records, modified_since=watermark,
+                                                          backup_key=keys["zoho_backup"], run_date=tracer.started_at)
+            print(f"Streamed {pipeline_summary['record_count']} records from Zoho CRM to MongoDB.")
+            new_watermark = pipeline_summary["watermark"]
+            zoho_digest, zoho_records = pipeline_summary["zoho_digest"], None
+            record_count = pipeline_summary["record_count"]
+            load_counts = {name: pipeline_summary[name] for name in ("inserted", "updated", "unchanged", "skipped")}
+        else:
+            # Step 1: Fetch data from Zoho CRM
+            print("Fetching leads data from Zoho CRM...")
+            # The extraction digest is kept for validation so the leads are not hashed a second time
+            zoho_digest = BucketedDigest()
+            with tracer.stage("Extraction"):
+                if mode == "resumable":
+                    leads = fetch_leads_resumable(max_records, modified_since=watermark, backup_key=keys["zoho_backup"],
+                                                  digest=zoho_digest)
+                elif incremental:
+                    leads = fetch_leads(max_records, modified_since=watermark, backup_key=keys["zoho_backup"],
+                                        digest=zoho_digest)
+                else:
+                    leads = fetch_leads(max_records, backup_key=keys["zoho_backup"], digest=zoho_digest)
+            print(f"Fetched {len(leads)} records from Zoho CRM.")
+
+            # Step 2: Perform incremental load to MongoDB
+            print("Performing incremental load to MongoDB...")
+            with tracer.stage("Incremental Load"):
+                load_counts = incremental_load(leads)
+            print("Incremental load to MongoDB complete.")
+            if mode == "resumable":
+                clear_extraction_checkpoint(watermark, max_records)
+            new_watermark = latest_modified_time(leads, watermark) if incremental else None
+            zoho_records = leads
+            record_count = len(leads)
 
-        # Step 2: Perform incremental load to MongoDB
-        print("Performing incremental load to MongoDB...")
-        incremental_load(leads)
-        print("Incremental load to MongoDB complete.")
+        # Advance the watermark only once the changes are loaded
+        if incremental and new_watermark and new_watermark != watermark:
+            save_watermark_to_s3(new_watermark)
 
         # Step 3: Backup MongoDB data to S3
         print("Backing up MongoDB data to S3...")
-        backup_mongo_data_to_s3()
+        with tracer.stage("Backup"):
+            if mode == "streaming":
+                mongo_backup_key = keys["mongo_backup_ndjson"]
+                mongo_manifest = stream_mongo_backup_to_s3(backup_key=mongo_backup_key, run_date=tracer.started_at)
+            else:
+                mongo_backup_key = keys["mongo_backup"]
+                mongo_manifest = backup_mongo_data_to_s3(backup_key=mongo_backup_key)
         print("MongoDB backup to S3 complete.")
 
-        # Step 4: Validate data between Zoho and MongoDB backups
+        # Step 4: Validate data between Zoho and MongoDB, reusing this run's digests instead of re-reading the backups;
+        # an incremental run only checks the leads it extracted
         print("Validating data between Zoho and MongoDB backups...")
-        validate_data()
+        with tracer.stage("Validation"):
+            discrepancies = validate_data(
+                zoho_backup_data_key=keys["zoho_backup"],
+                mongo_backup_data_key=mongo_backup_key,
+                discrepancies_key=keys["data_discrepancies"],
+                changed_only=incremental,
+                zoho_digest=zoho_digest,
+                zoho_records=zoho_records,
+                mongo_manifest=mongo_manifest
+            )
         print("Data validation complete.")
 
         # Step 5: Log ETL success
@@ -109,6 +650,14 @@ def main():
             message="ETL process completed successfully"
         )
         print("ETL process completed successfully.")
+        summary.update(
+            status="SUCCESS",
+            record_count=record_count,
+            load_counts=load_counts,
+            discrepancy_count=len(discrepancies) if discrepancies is not None else None,
+            watermark=new_watermark or watermark,
+            stages_ms=tracer.report()["stages_ms"]
+        )
     except Exception as e:
         # Log ETL failure
         print("An error occurred during the ETL process.")
@@ -119,6 +668,11 @@ def main():
             error_message=str(e)
         )
         raise e
+    finally:
+        summary["timing_report_key"] = save_timing_report()
+        flush_metrics()
+        flush_logs()
+    return summary
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from constants import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+class PooledSession(requests.Session):
+    """
+    requests.Session that applies default connect/read timeouts to every request.
+    """
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+_session = None
+_session_lock = threading.Lock()
+
+# Build a keep-alive session with a bounded connection pool
+def build_http_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                       timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+    """
+    Creates an HTTP session whose connections are kept alive and reused across requests.
+
+    Parameters:
+        pool_connections (int): Number of hosts to keep connection pools for.
+        pool_maxsize (int): Maximum connections kept open per host; should cover FETCH_CONCURRENCY.
+        timeout (tuple): Default (connect, read) timeouts in seconds.
+
+    Returns:
+        PooledSession: The configured session.
+    """
+    session = PooledSession(timeout=timeout)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return session
+
+# Shared session used for every Zoho and certificate request in the process
+def get_http_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_http_session()
+    return _session
+
+def close_http_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,107 @@
+import threading
+from pymongo import monitoring
+from constants import DATABASE, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Counts connection pool events so the pool settings can be tuned from real runs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "checkout_failures": 0,
+            "pool_clears": 0
+        }
+
+    def _increment(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counts)
+        stats["open_connections"] = stats["connections_created"] - stats["connections_closed"]
+        stats["in_use"] = stats["checkouts"] - stats["checkins"]
+        return stats
+
+    def connection_created(self, event):
+        self._increment("connections_created")
+
+    def connection_closed(self, event):
+        self._increment("connections_closed")
+
+    def connection_checked_out(self, event):
+        self._increment("checkouts")
+
+    def connection_checked_in(self, event):
+        self._increment("checkins")
+
+    def connection_check_out_failed(self, event):
+        self._increment("checkout_failures")
+
+    def pool_cleared(self, event):
+        self._increment("pool_clears")
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+class MongoClientManager:
+    """
+    Process-wide owner of the DocumentDB MongoClient.
+
+    The client is created on first use and then shared by every ETL stage, and by later warm Lambda
+    invocations, so the TLS handshake, credential lookup and pool warm-up are paid once per container.
+
+    Parameters:
+        connect (callable): Builds a connected MongoClient from pool options passed as keyword
+            arguments (maxPoolSize, minPoolSize, maxIdleTimeMS, event_listeners).
+    """
+
+    def __init__(self, connect, max_pool_size=MONGO_MAX_POOL_SIZE, min_pool_size=MONGO_MIN_POOL_SIZE,
+                 max_idle_time_ms=MONGO_MAX_IDLE_TIME_MS):
+        self._connect = connect
+        self.pool_options = {
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": min_pool_size,
+            "maxIdleTimeMS": max_idle_time_ms
+        }
+        self._lock = threading.Lock()
+        self._client = None
+        self._stats = PoolStatsListener()
+
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._connect(event_listeners=[self._stats], **self.pool_options)
+        return self._client
+
+    def get_collection(self, collection_name, database=DATABASE):
+        return self.get_client()[database][collection_name]
+
+    def pool_stats(self):
+        """Returns the pool settings and event counters accumulated since the client was created."""
+        return dict(self._stats.snapshot(), connected=self._client is not None, **self.pool_options)
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
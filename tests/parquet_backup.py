@@ -0,0 +1,80 @@
+from datetime import datetime
+from constants import S3_BUCKET_NAME, PARQUET_ROW_GROUP_SIZE
+from s3_key_builders import build_parquet_backup_key
+from s3_stream import S3MultipartWriter
+
+LEAD_PARQUET_FIELDS = ["First_Name", "Last_Name", "Email", "Phone", "Company", "Industry", "Lead_Status"]
+
+class ParquetBackupWriter:
+    """
+    Streams lead records to a Parquet file in S3, one row group every `row_group_size` records.
+
+    Files are laid out as `<source>/parquet/module=<module>/date=<YYYY-MM-DD>/part-0000.parquet` so
+    analytics jobs can prune by module and date. Only LEAD_PARQUET_FIELDS are kept, as strings.
+
+    Parameters:
+        source (str): Backup the file belongs to, "zoho-backup" or "mongo-backup".
+        module (str): Zoho module the records come from.
+        date (datetime): Partition date, today by default.
+        row_group_size (int): Records buffered per row group.
+        client: S3 client, defaults to the shared one.
+    """
+
+    def __init__(self, source, module="Leads", date=None, row_group_size=PARQUET_ROW_GROUP_SIZE, client=None):
+        pa, pq = self._pa, self._pq = _import_pyarrow()
+        self.schema = pa.schema([(field, pa.string()) for field in LEAD_PARQUET_FIELDS])
+        self.key = build_parquet_backup_key(source, module, date or datetime.now())
+        self.row_group_size = row_group_size
+        self.record_count = 0
+        self._rows = []
+        self._sink = S3MultipartWriter(
+            S3_BUCKET_NAME, self.key, content_type="application/vnd.apache.parquet", client=client
+        )
+        self._writer = pq.ParquetWriter(pa.PythonFile(self._sink, mode="w"), self.schema, compression="snappy")
+
+    def write_records(self, records):
+        for record in records:
+            self._rows.append({field: _as_string(record.get(field)) for field in LEAD_PARQUET_FIELDS})
+            if len(self._rows) >= self.row_group_size:
+                self._write_row_group()
+
+    def _write_row_group(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self.schema))
+            self.record_count += len(self._rows)
+            self._rows = []
+
+    def close(self):
+        self._write_row_group()
+        self._writer.close()
+        self._sink.close()
+
+    def abort(self):
+        # Close the Parquet writer first so it releases the sink; its footer is discarded with the upload
+        try:
+            self._writer.close()
+        except Exception as e:
+            print(f"Could not close the Parquet writer for {self.key}: {e}")
+        self._sink.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+# pyarrow is only needed when Parquet backups are enabled, so it is imported on first use rather than with the ETL
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet backups require pyarrow. Install it or keep the JSON backup format.") from None
+    return pyarrow, pyarrow.parquet
+
+def _as_string(value):
+    return value if value is None or isinstance(value, str) else str(value)
@@ -0,0 +1,71 @@
+from unittest.mock import patch, MagicMock
+from cache import TTLCache, secret_cache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+# Values are reused until their own TTL runs out
+def test_entries_expire_per_key():
+    clock = FakeClock()
+    cache = TTLCache(default_ttl=60, clock=clock)
+    loader = MagicMock(side_effect=["secret-1", "secret-2", "param-1"])
+
+    assert cache.get_or_load("secret", loader) == "secret-1"
+    assert cache.get_or_load("param", loader, ttl=600) == "secret-2"
+    clock.now += 61
+    assert cache.get_or_load("secret", loader) == "param-1"
+    assert cache.get_or_load("param", loader, ttl=600) == "secret-2"
+    assert loader.call_count == 3
+
+# Invalidated keys are loaded again on the next lookup
+def test_invalidate_forces_reload():
+    cache = TTLCache(default_ttl=60)
+    loader = MagicMock(side_effect=["old-password", "new-password"])
+
+    cache.get_or_load("mongo", loader)
+    cache.invalidate("mongo")
+
+    assert cache.get_or_load("mongo", loader) == "new-password"
+
+# Entries written to disk are picked up by a fresh cache, e.g. in a warm container
+def test_disk_cache_is_shared_between_instances(tmp_path):
+    disk_path = str(tmp_path / "cache.json")
+    clock = FakeClock()
+    TTLCache(default_ttl=60, disk_path=disk_path, clock=clock).get_or_load("secret", lambda: {"username": "etl"})
+
+    loader = MagicMock()
+    assert TTLCache(default_ttl=60, disk_path=disk_path, clock=clock).get_or_load("secret", loader) == {"username": "etl"}
+    loader.assert_not_called()
+
+    # Expired entries on disk are ignored
+    clock.now += 61
+    assert TTLCache(default_ttl=60, disk_path=disk_path, clock=clock).get_or_load("secret", lambda: "fresh") == "fresh"
+
+# A cache file that cannot be written does not fail the lookup; the entry is still cached in memory
+def test_unwritable_disk_cache_is_ignored(tmp_path):
+    cache = TTLCache(default_ttl=60, disk_path=str(tmp_path / "missing-dir" / "cache.json"), clock=FakeClock())
+    loader = MagicMock(return_value="password")
+
+    assert cache.get_or_load("secret", loader) == "password"
+    assert cache.get_or_load("secret", loader) == "password"
+    loader.assert_called_once()
+    cache.invalidate("secret")
+
+# send_notification no longer calls SSM for every message
+@patch("utils.sns_client")
+@patch("utils.ssm_client")
+def test_sns_topic_arn_is_cached(mock_ssm_client, mock_sns_client):
+    from utils import send_notification
+    secret_cache.invalidate()
+    mock_ssm_client.get_parameter.return_value = {"Parameter": {"Value": "arn:aws:sns:ap-southeast-2:123:etl"}}
+
+    send_notification("first")
+    send_notification("second")
+
+    mock_ssm_client.get_parameter.assert_called_once_with(Name="sns_topic_arn")
+    assert mock_sns_client.publish.call_count == 2
+    secret_cache.invalidate()
@@ -0,0 +1,116 @@
+import io
+import json
+import pytest
+from checkpoint import ExtractionCheckpoint
+
+class FakeS3Client:
+    """Minimal in-memory stand-in for the S3 calls used by the checkpoint."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body.encode("utf-8") if isinstance(Body, str) else Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"], None)
+
+# A new checkpoint starts at page 1 and parts are read back in page order
+def test_commit_and_read_back_parts():
+    client = FakeS3Client()
+    checkpoint = ExtractionCheckpoint("zoho-staging/leads-01-01-2025/", bucket="bucket", client=client)
+    assert checkpoint.load()["last_page"] == 0
+
+    checkpoint.commit_part(1, 2, [{"Email": "a@example.com"}, {"Email": "b@example.com"}])
+    checkpoint.commit_part(3, 3, [{"Email": "c@example.com"}])
+
+    assert list(checkpoint.iter_parts()) == [
+        [{"Email": "a@example.com"}, {"Email": "b@example.com"}],
+        [{"Email": "c@example.com"}],
+    ]
+    manifest = json.loads(client.objects["zoho-staging/leads-01-01-2025/manifest.json"])
+    assert manifest["last_page"] == 3 and manifest["record_count"] == 3
+
+# A restarted run resumes from the manifest written by the crashed one
+def test_resume_after_crash(mocker):
+    from etl import fetch_leads_resumable, clear_extraction_checkpoint
+    client = FakeS3Client()
+    mocker.patch("checkpoint.s3_client", client)
+    mocker.patch("etl.build_lead_request", return_value=({}, {"per_page": 1}))
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.save_backup_manifest")
+    mock_backup = mocker.patch("etl.S3JsonArrayWriter").return_value.__enter__.return_value
+
+    def crash_on_page_3(headers, params, max_records, concurrency, first_page=1):
+        yield [{"Email": "page1@example.com"}]
+        yield [{"Email": "page2@example.com"}]
+        raise RuntimeError("Lambda timeout")
+
+    mocker.patch("etl.iter_lead_pages", side_effect=crash_on_page_3)
+    with pytest.raises(RuntimeError):
+        fetch_leads_resumable(max_records=3, checkpoint_pages=1)
+
+    mock_iter_lead_pages = mocker.patch("etl.iter_lead_pages", return_value=iter([[{"Email": "page3@example.com"}]]))
+    leads = fetch_leads_resumable(max_records=3, checkpoint_pages=1)
+
+    assert mock_iter_lead_pages.call_args.kwargs["first_page"] == 3
+    assert [lead["Email"] for lead in leads] == ["page1@example.com", "page2@example.com", "page3@example.com"]
+    assert mock_backup.write_records.call_count == 3
+
+    # Clearing removes every staged object
+    clear_extraction_checkpoint(max_records=3)
+    assert client.objects == {}
+
+# The staging prefix identifies the extraction, so a resume after midnight finds the crashed run's pages
+def test_staging_prefix_depends_on_extraction_not_date():
+    from s3_key_builders import build_extraction_staging_prefix
+    prefix = build_extraction_staging_prefix("2024-05-01T10:00:00+10:00", 4000)
+
+    assert build_extraction_staging_prefix("2024-05-01T10:00:00+10:00", 4000) == prefix
+    assert prefix.startswith("zoho-staging/leads-")
+    assert build_extraction_staging_prefix("2024-05-02T10:00:00+10:00", 4000) != prefix
+    assert build_extraction_staging_prefix(None, 4000) != build_extraction_staging_prefix(None, 8000)
+
+def _stage_checkpoint(client, prefix, **manifest_fields):
+    checkpoint = ExtractionCheckpoint(prefix, bucket="bucket", client=client)
+    checkpoint.load(max_records=4)
+    checkpoint.commit_part(1, 1, [{"Email": "old@example.com"}])
+    checkpoint.manifest.update(manifest_fields)
+    checkpoint._save_manifest()
+
+# A checkpoint left by a crash days ago is deleted instead of spliced with today's pages
+def test_stale_checkpoint_is_discarded():
+    client = FakeS3Client()
+    _stage_checkpoint(client, "staging/", started_at="2020-01-01 00:00:00")
+
+    manifest = ExtractionCheckpoint("staging/", bucket="bucket", client=client).load(max_records=4)
+
+    assert manifest["last_page"] == 0 and manifest["parts"] == []
+    assert client.objects == {}
+
+# A finished extraction that was never cleared, e.g. because the load failed, is extracted again
+def test_completed_uncleared_checkpoint_is_discarded():
+    client = FakeS3Client()
+    _stage_checkpoint(client, "staging/", complete=True)
+
+    manifest = ExtractionCheckpoint("staging/", bucket="bucket", client=client).load(max_records=4)
+
+    assert not manifest["complete"] and manifest["last_page"] == 0
+    assert client.objects == {}
+
+def test_recent_checkpoint_of_same_extraction_is_resumed():
+    client = FakeS3Client()
+    _stage_checkpoint(client, "staging/")
+
+    assert ExtractionCheckpoint("staging/", bucket="bucket", client=client).load(max_records=4)["last_page"] == 1
+    assert ExtractionCheckpoint("staging/", bucket="bucket", client=client).load(max_records=8)["last_page"] == 0
@@ -0,0 +1,27 @@
+from comparison import compare_record_sets
+
+ZOHO = {
+    "a@example.com": {"Email": "a@example.com", "Last_Name": "Lee", "Phone": "1"},
+    "b@example.com": {"Email": "b@example.com", "Last_Name": "Kim", "Phone": None},
+    "c@example.com": {"Email": "c@example.com", "Last_Name": "Ng", "Phone": "3"},
+    "d@example.com": {"Email": "d@example.com", "Last_Name": "Wu", "Phone": 4},
+    "e@example.com": {"Email": "e@example.com", "Last_Name": "Ho", "Phone": None},
+}
+MONGO = {
+    "a@example.com": {"Email": "a@example.com", "Last_Name": "Lee", "Phone": "1"},
+    "b@example.com": {"Email": "b@example.com", "Last_Name": "Kim", "Phone": "2"},
+    "d@example.com": {"Email": "D@example.com", "Last_Name": "Wu", "Phone": "4"},
+    "e@example.com": {"Email": "e@example.com", "Last_Name": "Ho", "Phone": None},
+}
+
+# Discrepancies are reported per email in Zoho order and per field in REQUIRED_FIELDS order
+def test_compare_record_sets_reports_missing_and_changed_fields():
+    discrepancies = compare_record_sets(ZOHO, MONGO)
+
+    assert [(d["Email"], d.get("field", d.get("error"))) for d in discrepancies] == [
+        ("b@example.com", "Phone"),
+        ("c@example.com", "Missing in MongoDB"),
+        ("d@example.com", "Email"),
+        ("d@example.com", "Phone"),
+    ]
+    assert discrepancies[0] == {"Email": "b@example.com", "field": "Phone", "zoho_value": None, "mongo_value": "2"}
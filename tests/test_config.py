@@ -0,0 +1,25 @@
+from unittest.mock import patch, MagicMock
+from config import LazyClient, get_boto3_client
+
+# Clients are only built on first use, once, through get_boto3_client
+def test_lazy_client_builds_on_first_use():
+    real_client = MagicMock()
+    with patch('config.get_boto3_client', return_value=real_client) as mock_get_boto3_client:
+        client = LazyClient("s3", region="ap-southeast-2")
+        assert not client.created
+        mock_get_boto3_client.assert_not_called()
+
+        client.put_object(Bucket="bucket", Key="key", Body=b"")
+        client.list_objects_v2(Bucket="bucket")
+
+    mock_get_boto3_client.assert_called_once_with("s3", region="ap-southeast-2")
+    real_client.put_object.assert_called_once_with(Bucket="bucket", Key="key", Body=b"")
+    assert client.created
+
+# Injected clients are used as they are
+def test_injected_clients_are_used_without_building():
+    mock_client = MagicMock()
+    with patch('config.get_boto3_session') as mock_session:
+        assert get_boto3_client("sns", mock_client=mock_client) is mock_client
+        assert LazyClient("sns", mock_client=mock_client).get_client() is mock_client
+    mock_session.assert_not_called()
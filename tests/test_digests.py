@@ -0,0 +1,47 @@
+from digests import BucketedDigest, DatasetDigest, email_bucket, record_hash
+
+LEADS = [
+    {"Email": "a@example.com", "Phone": "1"},
+    {"Email": "b@example.com", "Phone": "2"},
+    {"Email": "c@example.com", "Phone": "3"},
+]
+
+# Digests do not depend on record or key order, nor on internal fields
+def test_digest_is_order_independent():
+    forward, backward = DatasetDigest(), DatasetDigest()
+    forward.update_many(LEADS)
+    backward.update_many(reversed(LEADS))
+
+    assert forward == backward
+    assert forward.count == 3
+    assert record_hash({"Phone": "1", "Email": "a@example.com", "_id": "x", "_content_hash": "y"}) == record_hash(LEADS[0])
+
+# Digests of separate chunks merge into the digest of the whole dataset
+def test_merged_chunks_match_full_digest():
+    full, first, second = DatasetDigest(), DatasetDigest(), DatasetDigest()
+    full.update_many(LEADS)
+    first.update_many(LEADS[:1])
+    second.update_many(LEADS[1:])
+    first.merge(second)
+
+    assert first == full
+    assert DatasetDigest.from_dict(full.to_dict()) == full
+
+# Changed and duplicated records are detected
+def test_digest_detects_changes_and_duplicates():
+    original, changed, duplicated = DatasetDigest(), DatasetDigest(), DatasetDigest()
+    original.update_many(LEADS)
+    changed.update_many(LEADS[:2] + [{"Email": "c@example.com", "Phone": "4"}])
+    duplicated.update_many(LEADS + LEADS[:1])
+
+    assert changed != original
+    assert duplicated != original
+
+# Only buckets holding a changed lead differ, and bucket digests survive a manifest round trip
+def test_bucketed_digest_localizes_changes():
+    zoho, mongo = BucketedDigest(bucket_count=16), BucketedDigest(bucket_count=16)
+    zoho.update_many(LEADS)
+    mongo.update_many(LEADS[:2] + [{"Email": " C@example.com", "Phone": "4"}])
+
+    assert zoho.differing_buckets(mongo) == [email_bucket("c@example.com", 16)]
+    assert BucketedDigest.from_dict(zoho.to_dict()).differing_buckets(zoho) == []
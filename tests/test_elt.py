@@ -1,5 +1,7 @@
 import pytest
+import time
 from etl import main
+from s3_key_builders import build_run_keys, build_s3_key_backup_leads
 
 # Mock all utility functions used in the main ETL flow
 def test_etl_process(mocker):
@@ -21,7 +23,7 @@ def test_etl_process(mocker):
     )
 
     # Check that each step was called
-    mock_fetch_leads.assert_called_once_with(4000)  # Adjust based on NUM_FETCH_DATA in your actual code
+    mock_fetch_leads.assert_called_once_with(4000, backup_key=build_s3_key_backup_leads(), digest=mocker.ANY)  # Adjust based on NUM_FETCH_DATA in your actual code
     mock_incremental_load.assert_called_once_with([{"lead_id": 1, "name": "Test Lead"}])
     mock_backup_mongo_data_to_s3.assert_called_once()
     mock_validate_data.assert_called_once()
@@ -49,3 +51,391 @@ def test_etl_failure(mocker):
         message="ETL process failed",
         error_message="Fetch error"
     )
+
+# Build a fake Zoho response for a page request
+def _zoho_page_response(mocker, status_code=200, records=None, headers=None):
+    response = mocker.MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = {"data": records} if records else {}
+    return response
+
+def test_fetch_leads_concurrent_keeps_page_order(mocker):
+    from etl import fetch_leads
+    mocker.patch("etl.get_access_token", return_value="token", create=True)
+    mocker.patch("etl.save_log_to_s3")
+    mock_save_backup_manifest = mocker.patch("etl.save_backup_manifest")
+    mock_s3_client = mocker.patch("etl.s3_client")
+
+    # Later pages answer first so out-of-order completion is exercised
+    def fake_get(url, headers=None, params=None):
+        page = params["page"]
+        time.sleep(0.01 * (4 - page) if page < 4 else 0)
+        if page > 3:
+            return _zoho_page_response(mocker, status_code=204)
+        return _zoho_page_response(mocker, records=[{"Email": f"lead{page}-{i}@example.com"} for i in range(2)])
+
+    mock_get = mocker.patch("etl.get_http_session").return_value.get
+    mock_get.side_effect = fake_get
+    mocker.patch("etl.ZOHO_PAGE_SIZE", 2)
+
+    leads = fetch_leads(max_records=100, concurrency=3)
+
+    assert [lead["Email"] for lead in leads] == [
+        f"lead{page}-{i}@example.com" for page in range(1, 4) for i in range(2)
+    ]
+    assert mock_get.call_count <= 4 + 3  # Stops shortly after the first empty page
+    mock_s3_client.put_object.assert_called_once()
+    assert mock_save_backup_manifest.call_args.args[1].count == 6
+
+def test_fetch_leads_retries_rate_limited_page(mocker):
+    from etl import fetch_leads
+    mocker.patch("etl.get_access_token", return_value="token", create=True)
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.save_backup_manifest")
+    mocker.patch("etl.s3_client")
+    mock_sleep = mocker.patch("etl.time.sleep")
+    mocker.patch("etl.get_http_session").return_value.get.side_effect = [
+        _zoho_page_response(mocker, status_code=429, headers={"Retry-After": "5"}),
+        _zoho_page_response(mocker, records=[{"Email": "a@example.com"}, {"Email": "b@example.com"}]),
+    ]
+
+    leads = fetch_leads(max_records=1, concurrency=2)
+
+    mock_sleep.assert_called_once_with(5)
+    assert leads == [{"Email": "a@example.com"}]
+
+def test_streaming_pipeline_loads_pages_without_full_list(mocker):
+    from etl import run_streaming_pipeline
+    mocker.patch("etl.build_lead_request", return_value=({}, {"per_page": 2}))
+    mocker.patch("etl.iter_lead_pages", return_value=iter([
+        [{"Email": "a@example.com"}, {"Email": "b@example.com"}],
+        [{"Email": "c@example.com"}, {"Email": "d@example.com"}],
+    ]))
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.ensure_leads_indexes")
+    mock_save_backup_manifest = mocker.patch("etl.save_backup_manifest")
+    mock_backup = mocker.patch("etl.S3JsonArrayWriter").return_value
+    mock_collection = mocker.patch("etl.get_leads_collection").return_value
+    mock_collection.bulk_write.side_effect = [
+        mocker.MagicMock(upserted_count=1, modified_count=0, matched_count=1),
+        mocker.MagicMock(upserted_count=1, modified_count=0, matched_count=0),
+    ]
+
+    summary = run_streaming_pipeline(max_records=3, queue_size=1)
+
+    assert summary == {
+        "record_count": 3, "inserted": 2, "updated": 0, "unchanged": 1, "skipped": 0, "watermark": None,
+        "zoho_digest": mock_backup.digest
+    }
+    assert mock_backup.write_records.call_count == 2
+    mock_backup.close.assert_called_once()
+    assert mock_save_backup_manifest.call_args.args[1] is mock_backup.digest
+    written = [[op._filter for op in c.args[0]] for c in mock_collection.bulk_write.call_args_list]
+    assert written == [[{"_email_key": "a@example.com"}, {"_email_key": "b@example.com"}], [{"_email_key": "c@example.com"}]]
+
+def test_streaming_pipeline_aborts_backup_on_load_failure(mocker):
+    from etl import run_streaming_pipeline
+    mocker.patch("etl.build_lead_request", return_value=({}, {"per_page": 2}))
+    mocker.patch("etl.iter_lead_pages", return_value=iter([[{"Email": "a@example.com"}]] * 10))
+    mocker.patch("etl.save_log_to_s3")
+    mock_backup = mocker.patch("etl.S3JsonArrayWriter").return_value
+    mocker.patch("etl.ensure_leads_indexes")
+    mock_collection = mocker.patch("etl.get_leads_collection").return_value
+    mock_collection.bulk_write.side_effect = Exception("DocumentDB unavailable")
+
+    with pytest.raises(Exception, match="DocumentDB unavailable"):
+        run_streaming_pipeline(max_records=20, queue_size=1)
+
+    mock_backup.abort.assert_called_once()
+    mock_backup.close.assert_not_called()
+
+# The extractor finishing on a full queue must not block a loader that is failing
+def test_streaming_pipeline_does_not_hang_when_load_fails_after_extraction(mocker):
+    import threading
+    from etl import run_streaming_pipeline
+    mocker.patch("etl.build_lead_request", return_value=({}, {"per_page": 1}))
+    mocker.patch("etl.iter_lead_pages", return_value=iter([[{"Email": "a@example.com"}], [{"Email": "b@example.com"}]]))
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.S3JsonArrayWriter")
+    mocker.patch("etl.ensure_leads_indexes")
+    mocker.patch("etl.get_leads_collection")
+
+    def failing_upsert(collection, records):
+        time.sleep(0.5)
+        raise Exception("DocumentDB unavailable")
+    mocker.patch("etl.upsert_leads", side_effect=failing_upsert)
+
+    errors = []
+    def run():
+        try:
+            run_streaming_pipeline(max_records=2, queue_size=1)
+        except Exception as e:
+            errors.append(e)
+    runner = threading.Thread(target=run, daemon=True)
+    runner.start()
+    runner.join(timeout=10)
+
+    assert not runner.is_alive()
+    assert str(errors[0]) == "DocumentDB unavailable"
+
+def test_fetch_page_refreshes_rejected_token(mocker):
+    from etl import fetch_page
+    mocker.patch("etl.get_access_token", side_effect=["expired-token", "fresh-token"])
+    mock_invalidate = mocker.patch("etl.invalidate_access_token")
+    mock_http = mocker.MagicMock()
+    mock_http.get.side_effect = [
+        _zoho_page_response(mocker, status_code=401),
+        _zoho_page_response(mocker, records=[{"Email": "a@example.com"}]),
+    ]
+
+    records = fetch_page(1, {}, {"per_page": 200}, http=mock_http)
+
+    assert records == [{"Email": "a@example.com"}]
+    mock_invalidate.assert_called_once_with("expired-token")
+    assert mock_http.get.call_args.kwargs["headers"]["Authorization"] == "Zoho-oauthtoken fresh-token"
+
+def test_build_lead_request_with_watermark_asks_for_changes_only(mocker):
+    from etl import build_lead_request
+    mocker.patch("etl.get_access_token", return_value="token")
+
+    headers, params = build_lead_request("2024-05-01T10:00:00+10:00")
+
+    assert headers["If-Modified-Since"] == "2024-05-01T10:00:00+10:00"
+    assert params["sort_by"] == "Modified_Time" and params["sort_order"] == "asc"
+    assert "Modified_Time" in params["fields"].split(",")
+
+def test_fetch_page_treats_not_modified_as_empty(mocker):
+    from etl import fetch_page
+    mocker.patch("etl.get_access_token", return_value="token")
+    mock_http = mocker.MagicMock()
+    mock_http.get.return_value = _zoho_page_response(mocker, status_code=304)
+
+    assert fetch_page(1, {}, {"per_page": 200}, http=mock_http) == []
+
+def test_incremental_etl_advances_watermark_after_load(mocker):
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.load_watermark_from_s3", return_value="2024-05-01T10:00:00+10:00")
+    mock_save_watermark = mocker.patch("etl.save_watermark_to_s3")
+    mock_fetch_leads = mocker.patch("etl.fetch_leads", return_value=[
+        {"Email": "a@example.com", "Modified_Time": "2024-05-02T09:00:00+10:00"},
+        {"Email": "b@example.com", "Modified_Time": "2024-05-01T23:30:00+00:00"},
+    ])
+    mock_incremental_load = mocker.patch("etl.incremental_load")
+    mocker.patch("etl.backup_mongo_data_to_s3")
+    mock_validate_data = mocker.patch("etl.validate_data")
+
+    main(incremental=True)
+
+    mock_fetch_leads.assert_called_once_with(4000, modified_since="2024-05-01T10:00:00+10:00",
+                                             backup_key=build_s3_key_backup_leads(), digest=mocker.ANY)
+    mock_incremental_load.assert_called_once()
+    mock_save_watermark.assert_called_once_with("2024-05-01T23:30:00+00:00")
+    assert mock_validate_data.call_args.kwargs["changed_only"] is True
+
+def test_incremental_load_upserts_in_batches_by_normalized_email(mocker):
+    from etl import incremental_load
+    mocker.patch("etl.save_log_to_s3")
+    mock_ensure_indexes = mocker.patch("etl.ensure_leads_indexes")
+    mock_collection = mocker.patch("etl.get_leads_collection").return_value
+    mock_collection.bulk_write.side_effect = [
+        mocker.MagicMock(upserted_count=1, modified_count=1, matched_count=1),
+        mocker.MagicMock(upserted_count=0, modified_count=0, matched_count=1),
+    ]
+
+    counts = incremental_load([
+        {"Email": " A@Example.com ", "Last_Name": "Old"},
+        {"Email": "b@example.com", "Last_Name": "B"},
+        {"Email": "a@example.com", "Last_Name": "New"},
+        {"Email": None, "Last_Name": "No email"},
+    ], batch_size=2)
+
+    mock_ensure_indexes.assert_called_once_with(mock_collection)
+    assert counts == {"inserted": 1, "updated": 1, "unchanged": 1, "skipped": 1}
+    first_batch = mock_collection.bulk_write.call_args_list[0]
+    assert first_batch.kwargs == {"ordered": False}
+    assert [op._filter for op in first_batch.args[0]] == [{"_email_key": "a@example.com"}, {"_email_key": "b@example.com"}]
+    assert first_batch.args[0][0]._doc["$set"]["_email_key"] == "a@example.com"
+    assert all(op._upsert for op in first_batch.args[0])
+
+def test_upsert_leads_skips_unchanged_content(mocker):
+    from etl import upsert_leads
+    from utils import calculate_record_hash
+    unchanged_lead = {"Email": "same@example.com", "Phone": "111"}
+    changed_lead = {"Email": "changed@example.com", "Phone": "222"}
+    mock_collection = mocker.MagicMock()
+    mock_collection.find.return_value = [
+        {"_email_key": "same@example.com", "_content_hash": calculate_record_hash(unchanged_lead)},
+        {"_email_key": "changed@example.com", "_content_hash": "stale-hash"},
+    ]
+    mock_collection.bulk_write.return_value = mocker.MagicMock(upserted_count=0, modified_count=1, matched_count=1)
+
+    counts = upsert_leads(mock_collection, [unchanged_lead, changed_lead])
+
+    assert counts == {"inserted": 0, "updated": 1, "unchanged": 1, "skipped": 0}
+    written = mock_collection.bulk_write.call_args.args[0]
+    assert [op._filter for op in written] == [{"_email_key": "changed@example.com"}]
+    assert written[0]._doc["$set"]["_content_hash"] == calculate_record_hash(changed_lead)
+
+def test_upsert_leads_writes_nothing_when_batch_is_unchanged(mocker):
+    from etl import upsert_leads
+    from utils import calculate_record_hash
+    lead = {"Email": "same@example.com", "Phone": "111"}
+    mock_collection = mocker.MagicMock()
+    mock_collection.find.return_value = [{"_email_key": "same@example.com", "_content_hash": calculate_record_hash(lead)}]
+
+    assert upsert_leads(mock_collection, [lead])["unchanged"] == 1
+    mock_collection.bulk_write.assert_not_called()
+
+def test_main_returns_run_summary(mocker):
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.fetch_leads", return_value=[{"Email": "a@example.com"}, {"Email": "b@example.com"}])
+    mocker.patch("etl.incremental_load", return_value={"inserted": 2, "updated": 0, "unchanged": 0, "skipped": 0})
+    mocker.patch("etl.backup_mongo_data_to_s3")
+    mocker.patch("etl.validate_data", return_value=[])
+    mocker.patch("etl.save_timing_report", return_value="logs/run/timing-report.json")
+
+    summary = main(run_id="run-1", max_records=2)
+
+    assert summary["run_id"] == "run-1"
+    assert summary["status"] == "SUCCESS"
+    assert summary["record_count"] == 2
+    assert summary["load_counts"]["inserted"] == 2
+    assert summary["discrepancy_count"] == 0
+    assert summary["timing_report_key"] == "logs/run/timing-report.json"
+    assert set(summary["stages_ms"]) == {"Extraction", "Incremental Load", "Backup", "Validation"}
+
+def test_main_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        main(mode="nightly")
+
+# Each module is requested from its own endpoint, keyed by its own field and loaded into its own collection
+def test_migrate_modules_runs_modules_under_one_rate_budget(mocker):
+    from etl import migrate_modules
+    from utils import calculate_record_hash
+    mocker.patch("etl.get_access_token", return_value="token", create=True)
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.save_backup_manifest")
+    mock_s3 = mocker.patch("etl.s3_client")
+    mocker.patch("etl.ensure_record_indexes")
+    collections = {"contacts": mocker.MagicMock(), "deals": mocker.MagicMock()}
+    for collection in collections.values():
+        collection.find.return_value = []
+        collection.bulk_write.return_value = mocker.MagicMock(upserted_count=1, modified_count=0, matched_count=0)
+    mocker.patch("etl.get_module_collection", side_effect=lambda module: collections[module.collection])
+    pages = {
+        "Contacts": [{"id": "1", "Email": "a@example.com"}],
+        "Deals": [{"id": 7, "Deal_Name": "Renewal"}],
+    }
+    mocker.patch("etl.get_http_session").return_value.get.side_effect = lambda url, headers, params: \
+        _zoho_page_response(mocker, records=pages[url.rsplit("/", 1)[1]] if params["page"] == 1 else None)
+    rate_limiter = mocker.MagicMock()
+
+    results = migrate_modules(["Contacts", "Deals"], max_records=400, rate_limiter=rate_limiter)
+
+    assert results["Contacts"] == {"inserted": 1, "updated": 0, "unchanged": 0, "skipped": 0,
+                                   "record_count": 1, "collection": "contacts"}
+    assert results["Deals"]["record_count"] == 1
+    assert rate_limiter.acquire.call_count == 4
+    written = collections["deals"].bulk_write.call_args.args[0]
+    assert [op._filter for op in written] == [{"_record_key": "7"}]
+    assert written[0]._doc["$set"]["_content_hash"] == calculate_record_hash(pages["Deals"][0])
+    backup_keys = {call.kwargs["Key"] for call in mock_s3.put_object.call_args_list}
+    assert any(key.startswith("zoho-backup/contacts-") for key in backup_keys)
+    assert any(key.startswith("zoho-backup/deals-") for key in backup_keys)
+
+# A 429 pauses the shared budget instead of only the thread that saw it
+def test_fetch_page_pauses_shared_rate_limiter_on_429(mocker):
+    from etl import fetch_page
+    mocker.patch("etl.get_access_token", return_value="token", create=True)
+    mock_sleep = mocker.patch("etl.time.sleep")
+    http = mocker.MagicMock()
+    http.get.side_effect = [
+        _zoho_page_response(mocker, status_code=429, headers={"Retry-After": "3"}),
+        _zoho_page_response(mocker, records=[{"id": "1"}]),
+    ]
+    rate_limiter = mocker.MagicMock()
+
+    records = fetch_page(1, {}, {"per_page": 200}, http=http, url="https://zoho.test/Deals", rate_limiter=rate_limiter)
+
+    assert records == [{"id": "1"}]
+    rate_limiter.pause.assert_called_once_with(3)
+    assert rate_limiter.acquire.call_count == 2
+    mock_sleep.assert_not_called()
+    assert http.get.call_args.args[0] == "https://zoho.test/Deals"
+
+def test_migrate_modules_reports_failed_modules(mocker):
+    from etl import migrate_modules
+    mock_save_log_to_s3 = mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.migrate_module", side_effect=lambda module, *args: (_ for _ in ()).throw(Exception("boom"))
+                 if module.name == "Deals" else {"record_count": 0})
+
+    with pytest.raises(Exception, match="Deals"):
+        migrate_modules(["Accounts", "Deals"], rate_limiter=mocker.MagicMock())
+    assert mock_save_log_to_s3.call_args.kwargs["error_message"] == "boom"
+
+def test_main_migrates_other_modules_in_parallel(mocker):
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.save_timing_report", return_value=None)
+    mock_fetch_leads = mocker.patch("etl.fetch_leads")
+    mock_migrate = mocker.patch("etl.migrate_modules", return_value={
+        "Contacts": {"record_count": 3, "inserted": 2, "updated": 1, "unchanged": 0, "skipped": 0, "collection": "contacts"},
+        "Leads": {"record_count": 1, "inserted": 0, "updated": 0, "unchanged": 1, "skipped": 0, "collection": "leads"},
+    })
+
+    summary = main(modules=["Contacts", "Leads"], max_records=10)
+
+    mock_migrate.assert_called_once_with(["Contacts", "Leads"], 10)
+    mock_fetch_leads.assert_not_called()
+    assert summary["record_count"] == 4
+    assert summary["load_counts"] == {"inserted": 2, "updated": 1, "unchanged": 1, "skipped": 0}
+    assert set(summary["stages_ms"]) == {"Module Migration"}
+
+@pytest.mark.parametrize("options", [{"modules": ["Campaigns"]}, {"modules": ["Deals"], "incremental": True},
+                                     {"modules": ["Deals"], "mode": "streaming"}])
+def test_main_rejects_unsupported_module_runs(options):
+    with pytest.raises(ValueError):
+        main(**options)
+
+# Every stage of a run uses the keys dated at the run's start, even in a warm container a day later
+def test_main_builds_dated_keys_per_run(mocker):
+    from datetime import datetime
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.save_timing_report", return_value=None)
+    mock_fetch_leads = mocker.patch("etl.fetch_leads", return_value=[])
+    mocker.patch("etl.incremental_load", return_value={"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0})
+    mock_backup = mocker.patch("etl.backup_mongo_data_to_s3")
+    mock_validate = mocker.patch("etl.validate_data", return_value=[])
+    run_dates = iter([datetime(2025, 3, 1, 23, 59), datetime(2025, 3, 2, 0, 1)])
+    mocker.patch("etl.build_run_keys", side_effect=lambda date: build_run_keys(next(run_dates)))
+
+    main()
+    main()
+
+    assert [call.kwargs["backup_key"] for call in mock_fetch_leads.call_args_list] == [
+        "zoho-backup/leads-01-03-2025.json", "zoho-backup/leads-02-03-2025.json"
+    ]
+    assert mock_backup.call_args.kwargs["backup_key"] == "mongo-backup/mongo-leads-backup-02-03-2025.json"
+    assert mock_validate.call_args.kwargs["zoho_backup_data_key"] == "zoho-backup/leads-02-03-2025.json"
+    assert mock_validate.call_args.kwargs["discrepancies_key"] == "data_disrepancies/discrepancies-02-03-2025.json"
+
+# Validation reuses the digest built during extraction instead of hashing the leads again
+def test_main_passes_extraction_digest_to_validation(mocker):
+    from digests import BucketedDigest
+    leads = [{"Email": "a@example.com"}, {"Email": "b@example.com"}]
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.save_timing_report", return_value=None)
+    mocker.patch("etl.get_access_token", return_value="token", create=True)
+    mocker.patch("etl.iter_lead_pages", return_value=iter([leads]))
+    mocker.patch("etl.s3_client")
+    mocker.patch("etl.save_backup_manifest")
+    mocker.patch("etl.incremental_load", return_value={"inserted": 2, "updated": 0, "unchanged": 0, "skipped": 0})
+    mocker.patch("etl.backup_mongo_data_to_s3")
+    mock_validate = mocker.patch("etl.validate_data", return_value=[])
+
+    main(max_records=2)
+
+    expected = BucketedDigest()
+    expected.update_many(leads)
+    assert mock_validate.call_args.kwargs["zoho_digest"] == expected
+    assert mock_validate.call_args.kwargs["zoho_records"] == leads
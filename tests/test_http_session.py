@@ -0,0 +1,45 @@
+from unittest.mock import patch, MagicMock
+import requests
+from http_session import build_http_session, get_http_session, close_http_session
+from constants import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+# The session asks for compressed responses and keeps connections alive
+def test_session_sends_gzip_and_keep_alive_headers():
+    session = build_http_session(pool_maxsize=8)
+
+    assert session.headers["Accept-Encoding"] == "gzip, deflate"
+    assert session.headers["Connection"] == "keep-alive"
+    assert session.get_adapter("https://www.zohoapis.com.au")._pool_maxsize == 8
+
+# Every request gets the default timeouts unless the caller overrides them
+@patch.object(requests.Session, "request")
+def test_session_applies_default_timeout(mock_request):
+    session = build_http_session()
+
+    session.get("https://www.zohoapis.com.au/crm/v2/Leads")
+    session.get("https://www.zohoapis.com.au/crm/v2/Leads", timeout=1)
+
+    assert mock_request.call_args_list[0].kwargs["timeout"] == (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    assert mock_request.call_args_list[1].kwargs["timeout"] == 1
+
+# One session is shared until it is explicitly closed
+def test_shared_session_is_reused():
+    close_http_session()
+    session = get_http_session()
+
+    assert get_http_session() is session
+    close_http_session()
+    assert get_http_session() is not session
+    close_http_session()
+
+# The OAuth token call goes through the shared session
+@patch("utils.build_access_token_url", return_value="https://accounts.example/oauth/v2/token")
+@patch("utils.get_http_session")
+def test_request_access_token_uses_shared_session(mock_get_http_session, mock_build_url):
+    from utils import request_access_token
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"access_token": "mock_access_token", "expires_in": 3600}
+    mock_get_http_session.return_value.post.return_value = mock_response
+
+    assert request_access_token() == ("mock_access_token", 3600)
+    mock_get_http_session.return_value.post.assert_called_once_with("https://accounts.example/oauth/v2/token")
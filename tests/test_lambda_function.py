@@ -0,0 +1,33 @@
+import pytest
+import lambda_function
+from lambda_function import lambda_handler, parse_event
+
+# Event parameters reach main, and warm invocations are reported as such
+def test_handler_passes_event_options_and_reports_warm_starts(mocker):
+    mock_main = mocker.patch("lambda_function.main", return_value={"run_id": "req-1", "status": "SUCCESS"})
+    mocker.patch("lambda_function.get_mongo_pool_stats", return_value={"connected": True})
+    mocker.patch("lambda_function._invocation_count", 0)
+    context = mocker.MagicMock(aws_request_id="req-1")
+    context.get_remaining_time_in_millis.return_value = 600000
+
+    first = lambda_handler({"record_limit": "500", "mode": "streaming", "incremental": "true"}, context)
+    second = lambda_handler({}, context)
+
+    mock_main.assert_any_call(run_id="req-1", max_records=500, mode="streaming", incremental=True, profile=None,
+                              modules=["Leads"])
+    assert first["status"] == "SUCCESS" and first["module"] == "Leads"
+    assert first["cold_start"] and not second["cold_start"]
+    assert second["invocation_count"] == 2
+    assert second["mongo_pool"] == {"connected": True}
+
+# Several modules can be requested as a list or a comma-separated string
+def test_parse_event_accepts_module_lists():
+    assert parse_event({"modules": ["Contacts", "Deals"]})["modules"] == ["Contacts", "Deals"]
+    assert parse_event({"modules": "Accounts, Deals"})["modules"] == ["Accounts", "Deals"]
+    assert parse_event({"module": "Contacts"})["modules"] == ["Contacts"]
+
+@pytest.mark.parametrize("event", [{"mode": "nightly"}, {"module": "Campaigns"}, {"modules": ["Deals", "Campaigns"]},
+                                   {"modules": []}, {"max_records": 0}])
+def test_invalid_events_are_rejected(event):
+    with pytest.raises(ValueError):
+        parse_event(event)
@@ -0,0 +1,64 @@
+import json
+import time
+from datetime import datetime
+from unittest.mock import MagicMock
+from log_shipper import S3LogShipper
+
+def _shipped(client):
+    return {c.kwargs["Key"]: [json.loads(line) for line in c.kwargs["Body"].decode("utf-8").splitlines()]
+            for c in client.put_object.call_args_list}
+
+# Full batches are shipped as numbered NDJSON objects under the run ID
+def test_entries_are_batched_by_count():
+    client = MagicMock()
+    shipper = S3LogShipper("bucket", client, run_id="run-1", max_entries=2, flush_interval=60)
+
+    for i in range(5):
+        shipper.emit({"message": f"entry {i}"})
+    assert shipper.flush()
+
+    shipped = _shipped(client)
+    assert [key.rsplit("/", 2)[1:] for key in shipped] == [["run-1", "000000.ndjson"], ["run-1", "000001.ndjson"], ["run-1", "000002.ndjson"]]
+    assert [entry["message"] for batch in shipped.values() for entry in batch] == [f"entry {i}" for i in range(5)]
+    shipper.close()
+
+# A partial batch is shipped once its oldest entry has waited flush_interval
+def test_partial_batch_is_shipped_on_interval():
+    client = MagicMock()
+    shipper = S3LogShipper("bucket", client, run_id="run-2", max_entries=100, flush_interval=0.05)
+
+    shipper.emit({"message": "only entry"})
+    deadline = time.monotonic() + 2
+    while not client.put_object.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    client.put_object.assert_called_once()
+    shipper.close()
+
+# Upload failures and a full queue never reach the caller
+def test_emit_never_raises_or_blocks():
+    client = MagicMock()
+    client.put_object.side_effect = Exception("S3 unavailable")
+    shipper = S3LogShipper("bucket", client, run_id="run-3", max_entries=1, max_queue=1)
+    shipper._ensure_started = lambda: None
+
+    assert shipper.emit({"message": "queued"})
+    assert not shipper.emit({"message": "dropped"})
+    assert shipper.dropped == 1
+
+    del shipper._ensure_started
+    shipper._ensure_started()
+    assert shipper.flush()
+    shipper.close()
+
+# Batches shipped after midnight stay under the date the run started
+def test_batches_are_dated_by_run_start():
+    client = MagicMock()
+    shipper = S3LogShipper("bucket", client, max_entries=100, flush_interval=60)
+    shipper.start_run("run-4", started_at=datetime(2024, 3, 1, 23, 59, 59))
+
+    shipper.emit({"message": "after midnight"})
+    assert shipper.flush()
+
+    assert list(_shipped(client)) == ["logs/01-03-2024/run-4/000000.ndjson"]
+    shipper.close()
@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock
+from metrics import MetricsEmitter
+
+# Samples between flushes are folded into one statistic set per metric and dimensions
+def test_samples_are_aggregated_into_statistic_sets():
+    client = MagicMock()
+    emitter = MetricsEmitter(client, namespace="test", dimensions={"project": "zoho"})
+    emitter._ensure_started = lambda: None
+
+    for value in (200, 200, 50):
+        emitter.increment("RecordsProcessed", value, dimensions={"Stage": "Extraction"})
+    emitter.gauge("RecordsPerSecond", 10)
+    emitter.gauge("RecordsPerSecond", 12)
+
+    assert emitter.flush() == 2
+    datums = {datum["MetricName"]: datum for datum in client.put_metric_data.call_args.kwargs["MetricData"]}
+    assert datums["RecordsProcessed"]["StatisticValues"] == {"SampleCount": 3, "Sum": 450, "Minimum": 50, "Maximum": 200}
+    assert datums["RecordsProcessed"]["Dimensions"] == [{"Name": "Stage", "Value": "Extraction"}, {"Name": "project", "Value": "zoho"}]
+    assert datums["RecordsPerSecond"]["Value"] == 12
+    assert emitter.flush() == 0
+
+# Flushes respect the datums-per-request limit and survive CloudWatch errors
+def test_flush_splits_requests_and_swallows_errors():
+    client = MagicMock()
+    client.put_metric_data.side_effect = [None, Exception("Throttled"), None]
+    emitter = MetricsEmitter(client, max_datums=2)
+    emitter._ensure_started = lambda: None
+
+    for page in range(6):
+        with emitter.timer("PageLatency", dimensions={"Page": page}):
+            pass
+
+    assert emitter.flush() == 4
+    assert client.put_metric_data.call_count == 3
+    assert all(datum["Unit"] == "Milliseconds" for c in client.put_metric_data.call_args_list for datum in c.kwargs["MetricData"])
@@ -0,0 +1,53 @@
+import threading
+from unittest.mock import MagicMock
+from mongo_pool import MongoClientManager
+from constants import DATABASE
+
+# The client is built once, with the pool options, and shared by all callers
+def test_client_is_created_once_and_shared():
+    mock_client = MagicMock()
+    connect = MagicMock(return_value=mock_client)
+    manager = MongoClientManager(connect, max_pool_size=8, min_pool_size=2, max_idle_time_ms=1000)
+
+    threads = [threading.Thread(target=manager.get_collection, args=("leads",)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    connect.assert_called_once()
+    kwargs = connect.call_args.kwargs
+    assert (kwargs["maxPoolSize"], kwargs["minPoolSize"], kwargs["maxIdleTimeMS"]) == (8, 2, 1000)
+    assert manager.get_collection("leads") is mock_client[DATABASE]["leads"]
+
+# Pool events reported by pymongo show up in the statistics
+def test_pool_stats_count_pool_events():
+    connect = MagicMock()
+    manager = MongoClientManager(connect)
+    manager.get_client()
+    listener = connect.call_args.kwargs["event_listeners"][0]
+
+    listener.connection_created(None)
+    listener.connection_created(None)
+    listener.connection_checked_out(None)
+    listener.connection_checked_out(None)
+    listener.connection_checked_in(None)
+    listener.connection_closed(None)
+
+    stats = manager.pool_stats()
+    assert stats["connections_created"] == 2
+    assert stats["open_connections"] == 1
+    assert stats["in_use"] == 1
+    assert stats["connected"] is True
+
+# Closing drops the client so the next caller reconnects
+def test_close_releases_client():
+    connect = MagicMock()
+    manager = MongoClientManager(connect)
+    client = manager.get_client()
+
+    manager.close()
+
+    client.close.assert_called_once()
+    manager.get_client()
+    assert connect.call_count == 2
@@ -0,0 +1,59 @@
+import io
+import pytest
+from unittest.mock import MagicMock
+from datetime import datetime
+from s3_key_builders import build_parquet_backup_key
+
+pq = pytest.importorskip("pyarrow.parquet")
+from parquet_backup import ParquetBackupWriter
+
+# Keys are partitioned by module and date
+def test_parquet_key_is_partitioned_by_module_and_date():
+    key = build_parquet_backup_key("zoho-backup", "Leads", datetime(2024, 5, 1))
+    assert key == "zoho-backup/parquet/module=Leads/date=2024-05-01/part-0000.parquet"
+
+# Records are written in row groups with the typed lead schema
+def test_writer_produces_row_groups_with_lead_schema():
+    mock_s3_client = MagicMock()
+    records = [{"Email": f"lead{i}@example.com", "Phone": 100 + i, "Modified_Time": "ignored"} for i in range(5)]
+
+    with ParquetBackupWriter("mongo-backup", date=datetime(2024, 5, 1), row_group_size=2, client=mock_s3_client) as writer:
+        writer.write_records(records[:3])
+        writer.write_records(records[3:])
+
+    upload = mock_s3_client.put_object.call_args.kwargs
+    assert upload["Key"] == "mongo-backup/parquet/module=Leads/date=2024-05-01/part-0000.parquet"
+    parquet_file = pq.ParquetFile(io.BytesIO(upload["Body"]))
+    assert parquet_file.num_row_groups == 3
+    assert parquet_file.schema_arrow.names == ["First_Name", "Last_Name", "Email", "Phone", "Company", "Industry", "Lead_Status"]
+    table = parquet_file.read()
+    assert table.column("Phone").to_pylist() == ["100", "101", "102", "103", "104"]
+    assert writer.record_count == 5
+
+# An aborted backup closes its Parquet writer and uploads nothing
+def test_abort_closes_writer_without_uploading():
+    mock_s3_client = MagicMock()
+
+    with pytest.raises(RuntimeError):
+        with ParquetBackupWriter("zoho-backup", date=datetime(2024, 5, 1), client=mock_s3_client) as writer:
+            writer.write_records([{"Email": "a@example.com"}])
+            raise RuntimeError("load failed")
+
+    assert not writer._writer.is_open
+    mock_s3_client.put_object.assert_not_called()
+
+# The partition is the run's date, not the date the backup happens to be written
+def test_streaming_pipeline_partitions_parquet_by_run_date(mocker):
+    from etl import run_streaming_pipeline
+    mocker.patch("etl.build_lead_request", return_value=({}, {"per_page": 1}))
+    mocker.patch("etl.iter_lead_pages", return_value=iter([]))
+    mocker.patch("etl.save_log_to_s3")
+    mocker.patch("etl.S3JsonArrayWriter")
+    mocker.patch("etl.save_backup_manifest")
+    mocker.patch("etl.ensure_leads_indexes")
+    mocker.patch("etl.get_leads_collection")
+    mock_parquet = mocker.patch("etl.ParquetBackupWriter")
+
+    run_streaming_pipeline(max_records=1, parquet=True, run_date=datetime(2024, 5, 1, 23, 59))
+
+    mock_parquet.assert_called_once_with("zoho-backup", date=datetime(2024, 5, 1, 23, 59))
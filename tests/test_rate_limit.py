@@ -0,0 +1,43 @@
+import threading
+from rate_limit import TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def test_burst_is_served_then_requests_wait_for_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == 0.5
+    assert clock.now == 0.5
+
+def test_pause_holds_every_caller_until_retry_after():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=10, clock=clock, sleep=clock.sleep)
+
+    bucket.pause(5)
+
+    assert bucket.acquire() == 5
+    assert clock.now == 5
+
+def test_threads_share_one_budget():
+    bucket = TokenBucket(rate=1000, capacity=5)
+    waits = []
+    threads = [threading.Thread(target=lambda: waits.append(bucket.acquire())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(waits) == 10
+    assert sum(1 for waited in waits if waited == 0) >= 5
@@ -0,0 +1,99 @@
+import json
+from unittest.mock import MagicMock
+from s3_stream import S3MultipartWriter, S3JsonArrayWriter
+
+# Small objects are written with a single put_object
+def test_small_object_uses_put_object():
+    mock_s3_client = MagicMock()
+
+    with S3MultipartWriter("bucket", "key.json", part_size=1024, client=mock_s3_client) as writer:
+        writer.write("hello")
+
+    mock_s3_client.put_object.assert_called_once_with(
+        Bucket="bucket", Key="key.json", Body=b"hello", ContentType="application/json"
+    )
+    mock_s3_client.create_multipart_upload.assert_not_called()
+
+# Large objects are uploaded part by part as the buffer fills
+def test_large_object_uses_multipart_upload():
+    mock_s3_client = MagicMock()
+    mock_s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    mock_s3_client.upload_part.side_effect = [{"ETag": "etag-1"}, {"ETag": "etag-2"}]
+
+    writer = S3MultipartWriter("bucket", "key.json", part_size=4, client=mock_s3_client)
+    writer.write("12345")
+    writer.write("67")
+    writer.close()
+
+    assert [c.kwargs["Body"] for c in mock_s3_client.upload_part.call_args_list] == [b"12345", b"67"]
+    mock_s3_client.complete_multipart_upload.assert_called_once_with(
+        Bucket="bucket",
+        Key="key.json",
+        UploadId="upload-1",
+        MultipartUpload={"Parts": [{"ETag": "etag-1", "PartNumber": 1}, {"ETag": "etag-2", "PartNumber": 2}]}
+    )
+
+# A failure inside the context aborts the upload
+def test_exception_aborts_upload():
+    mock_s3_client = MagicMock()
+    mock_s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    mock_s3_client.upload_part.return_value = {"ETag": "etag-1"}
+
+    try:
+        with S3MultipartWriter("bucket", "key.json", part_size=1, client=mock_s3_client) as writer:
+            writer.write("data")
+            raise RuntimeError("loader failed")
+    except RuntimeError:
+        pass
+
+    mock_s3_client.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="key.json", UploadId="upload-1")
+    mock_s3_client.complete_multipart_upload.assert_not_called()
+
+# Records written in batches form a single JSON array
+def test_json_array_writer_produces_valid_json():
+    mock_s3_client = MagicMock()
+
+    writer = S3JsonArrayWriter("bucket", "key.json", client=mock_s3_client)
+    writer.write_records([{"Email": "a@example.com"}])
+    writer.write_records([{"Email": "b@example.com"}, {"Email": "c@example.com"}])
+    writer.close()
+
+    body = mock_s3_client.put_object.call_args.kwargs["Body"]
+    assert json.loads(body) == [{"Email": "a@example.com"}, {"Email": "b@example.com"}, {"Email": "c@example.com"}]
+    assert writer.record_count == 3
+
+# Parts uploaded in parallel are still completed in part-number order
+def test_parallel_parts_complete_in_order():
+    import threading
+    import time
+    mock_s3_client = MagicMock()
+    mock_s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+
+    def slow_first_part(Bucket, Key, PartNumber, UploadId, Body):
+        time.sleep(0.05 if PartNumber == 1 else 0)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    mock_s3_client.upload_part.side_effect = slow_first_part
+
+    with S3MultipartWriter("bucket", "key.gz", part_size=2, client=mock_s3_client, max_workers=3) as writer:
+        for chunk in ["aa", "bb", "cc", "dd", "e"]:
+            writer.write(chunk)
+
+    parts = mock_s3_client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert parts == [{"ETag": f"etag-{n}", "PartNumber": n} for n in range(1, 6)]
+
+# A part that fails to upload in the background aborts the upload instead of orphaning it
+def test_failed_parallel_part_aborts_upload():
+    import pytest
+    mock_s3_client = MagicMock()
+    mock_s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    mock_s3_client.upload_part.side_effect = RuntimeError("part rejected")
+
+    with pytest.raises(RuntimeError, match="part rejected"):
+        with S3MultipartWriter("bucket", "key.json", part_size=4, client=mock_s3_client, max_workers=4) as writer:
+            writer.write("12345")
+            writer.write("67")
+
+    mock_s3_client.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="key.json", UploadId="upload-1")
+    mock_s3_client.complete_multipart_upload.assert_not_called()
+    assert writer.closed
@@ -0,0 +1,69 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from token_manager import AccessTokenManager
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+# The token is reused until it enters the refresh margin
+def test_token_is_cached_until_refresh_margin():
+    clock = FakeClock()
+    fetch_token = MagicMock(side_effect=[("token-1", 3600), ("token-2", 3600)])
+    manager = AccessTokenManager(fetch_token, refresh_margin=300, clock=clock)
+
+    assert manager.get_token() == "token-1"
+    clock.now = 3000
+    assert manager.get_token() == "token-1"
+    assert fetch_token.call_count == 1
+
+    # Past expiry the caller waits for a fresh token
+    clock.now = 3600
+    assert manager.get_token() == "token-2"
+    assert fetch_token.call_count == 2
+
+# Inside the margin the old token is returned while the next one is fetched in the background
+def test_token_is_refreshed_in_background_before_expiry():
+    clock = FakeClock()
+    fetch_token = MagicMock(side_effect=[("token-1", 3600), ("token-2", 3600)])
+    manager = AccessTokenManager(fetch_token, refresh_margin=300, clock=clock)
+    manager.get_token()
+
+    clock.now = 3400
+    assert manager.get_token() == "token-1"
+    manager._background_refresh.join(timeout=5)
+    assert manager.get_token() == "token-2"
+
+# A rejected token is refreshed once, however many callers report it
+def test_invalidate_only_drops_the_rejected_token():
+    fetch_token = MagicMock(side_effect=[("token-1", 3600), ("token-2", 3600)])
+    manager = AccessTokenManager(fetch_token)
+    manager.get_token()
+
+    manager.invalidate("token-1")
+    assert manager.get_token() == "token-2"
+    manager.invalidate("token-1")
+    assert manager.get_token() == "token-2"
+    assert fetch_token.call_count == 2
+
+# Concurrent callers share one in-flight refresh
+def test_concurrent_callers_share_one_refresh():
+    def slow_fetch():
+        time.sleep(0.05)
+        return "token-1", 3600
+
+    fetch_token = MagicMock(side_effect=slow_fetch)
+    manager = AccessTokenManager(fetch_token)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(manager.get_token())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens == ["token-1"] * 8
+    assert fetch_token.call_count == 1
@@ -0,0 +1,60 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from tracing import RunTracer
+
+# Stages and their sub-spans nest, and the report lists stage durations
+def test_spans_nest_and_report_stage_durations():
+    metrics = MagicMock()
+    tracer = RunTracer(run_id="run-1", sub_spans=True, profile=False, metrics=metrics)
+
+    with tracer.stage("Extraction"):
+        with tracer.span("Zoho page", page=1):
+            pass
+    with pytest.raises(ValueError):
+        with tracer.stage("Validation"):
+            raise ValueError("mismatch")
+
+    report = tracer.report()
+    spans = {span["name"]: span for span in report["spans"]}
+    assert spans["Zoho page"]["parent"] == spans["Extraction"]["id"]
+    assert spans["Zoho page"]["attributes"] == {"page": 1}
+    assert spans["Validation"]["status"] == "ERROR"
+    assert set(report["stages_ms"]) == {"Extraction", "Validation"}
+    assert metrics.record.call_count == 2
+
+# Sub-spans are skipped unless enabled
+def test_sub_spans_are_opt_in():
+    tracer = RunTracer(run_id="run-2", sub_spans=False, profile=False)
+
+    with tracer.stage("Incremental Load"):
+        with tracer.span("Load batch", start=0) as span:
+            assert span is None
+
+    assert [span["name"] for span in tracer.report()["spans"]] == ["Incremental Load"]
+
+# Profiled stages save cProfile and tracemalloc outputs next to the timing report
+def test_profiled_stage_outputs_are_saved_with_the_report():
+    client = MagicMock()
+    tracer = RunTracer(run_id="run-3", profile=True)
+
+    with tracer.stage("Backup"):
+        [str(i) for i in range(1000)]
+    key = tracer.save_report(client)
+
+    uploads = {c.kwargs["Key"]: c.kwargs["Body"] for c in client.put_object.call_args_list}
+    assert key.endswith("/run-3/timing-report.json")
+    assert json.loads(uploads[key])["spans"][0]["memory_peak_bytes"] > 0
+    assert {name.rsplit("/", 1)[1] for name in uploads if "/profile/" in name} == {
+        "backup.cprofile.pstats", "backup.cprofile.txt", "backup.tracemalloc.txt"
+    }
+
+# A profiled run does not leave profiling on for the next run in the same container
+def test_run_options_reset_to_defaults():
+    tracer = RunTracer(run_id="run-4", profile=False, sub_spans=False)
+
+    tracer.start_run("run-5", profile=True, sub_spans=True)
+    assert tracer.profile and tracer.sub_spans
+
+    tracer.start_run("run-6")
+    assert not tracer.profile and not tracer.sub_spans
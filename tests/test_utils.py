@@ -1,5 +1,6 @@
 # test_utils.py
 import pytest
+import json
 from datetime import datetime
 from unittest.mock import patch, MagicMock, mock_open
 from utils import save_log_to_s3, get_zoho_secret, test_get_access_token, test_download_ca_certificate, test_get_leads_collection
@@ -98,3 +99,231 @@ def test_get_leads_collection(mock_mongo_client):
     # Ensure the collection was retrieved
     assert collection == mock_collection
     mock_db.create_collection.assert_not_called()  # Collection already exists
+
+
+# Test that leads stored before the unique index existed are backfilled before it is created
+def test_ensure_leads_indexes_backfills_existing_leads():
+    from utils import ensure_leads_indexes
+    mock_collection = MagicMock()
+    mock_collection.index_information.return_value = {"_id_": {}}
+    mock_collection.find.return_value = [
+        {"_id": 1, "Email": " Lead@Example.com"},
+        {"_id": 2, "Email": None},
+    ]
+
+    ensure_leads_indexes(mock_collection)
+
+    backfill = mock_collection.bulk_write.call_args.args[0]
+    assert [(op._filter, op._doc) for op in backfill] == [({"_id": 1}, {"$set": {"_email_key": "lead@example.com"}})]
+    mock_collection.create_index.assert_called_once_with(
+        [("_email_key", 1)], name="_email_key_unique", unique=True, sparse=True
+    )
+
+    # Once the index exists nothing is scanned again
+    mock_collection.reset_mock()
+    mock_collection.index_information.return_value = {"_email_key_unique": {}}
+    ensure_leads_indexes(mock_collection)
+    mock_collection.find.assert_not_called()
+
+
+# Case-variant duplicates left by the old inserts stop the index from being built; nothing is deleted
+@patch('utils.save_log_to_s3')
+def test_ensure_leads_indexes_refuses_duplicate_keys(mock_save_log_to_s3):
+    from utils import ensure_leads_indexes
+    mock_collection = MagicMock()
+    mock_collection.index_information.return_value = {"_id_": {}}
+    mock_collection.find.return_value = [
+        {"_id": 1, "Email": "A@Example.com"},
+        {"_id": 3, "Email": "a@example.com "},
+    ]
+    mock_collection.aggregate.return_value = [{"_id": "a@example.com", "ids": [3, 1], "count": 2}]
+
+    with pytest.raises(Exception, match="dedupe_keys.py Leads"):
+        ensure_leads_indexes(mock_collection)
+
+    backfill = mock_collection.bulk_write.call_args.args[0]
+    assert {op._doc["$set"]["_email_key"] for op in backfill} == {"a@example.com"}
+    mock_collection.delete_many.assert_not_called()
+    mock_collection.create_index.assert_not_called()
+    assert mock_save_log_to_s3.call_args.kwargs["status"] == "ERROR"
+
+# The migration only lists duplicates in a dry run and backs them up to S3 before deleting them
+@patch('utils.save_log_to_s3')
+@patch('utils.s3_client')
+def test_remove_duplicate_keys_dry_run_and_apply(mock_s3_client, mock_save_log_to_s3):
+    from utils import remove_duplicate_keys
+    from zoho_modules import LEADS_MODULE
+    mock_collection = MagicMock()
+    mock_collection.aggregate.return_value = [{"_id": "a@example.com", "ids": [3, 1], "count": 2}]
+
+    report = remove_duplicate_keys(mock_collection, LEADS_MODULE)
+    assert report == {"module": "Leads", "duplicate_keys": 1, "documents": 1, "dry_run": True}
+    mock_collection.delete_many.assert_not_called()
+    mock_s3_client.put_object.assert_not_called()
+
+    calls = []
+    mock_collection.find.return_value = [{"_id": 1, "Email": "A@Example.com"}]
+    mock_s3_client.put_object.side_effect = lambda **kwargs: calls.append(("backup", kwargs))
+    mock_collection.delete_many.side_effect = lambda query: calls.append(("delete", query))
+
+    report = remove_duplicate_keys(mock_collection, LEADS_MODULE, dry_run=False, backup_key="migrations/leads.json")
+
+    assert [name for name, _ in calls] == ["backup", "delete"]
+    assert json.loads(calls[0][1]["Body"]) == [{"_id": 1, "Email": "A@Example.com"}]
+    assert calls[1][1] == {"_id": {"$in": [1]}}
+    assert report["backup_key"] == "migrations/leads.json"
+
+# Test that a valid cached CA bundle is reused without any HTTP request
+@patch('utils.get_http_session')
+def test_ensure_ca_bundle_reuses_valid_cache(mock_get_http_session, tmp_path):
+    from utils import ensure_ca_bundle
+    bundle_path = str(tmp_path / "global-bundle.pem")
+    mock_get_http_session.return_value.get.return_value.content = b"-----BEGIN CERTIFICATE-----\nabc\n"
+
+    assert ensure_ca_bundle(bundle_path) == bundle_path
+    assert ensure_ca_bundle(bundle_path) == bundle_path
+    assert mock_get_http_session.return_value.get.call_count == 1
+
+    # A bundle that no longer matches its checksum is downloaded again
+    with open(bundle_path, 'ab') as ca_file:
+        ca_file.write(b"corrupted")
+    ensure_ca_bundle(bundle_path)
+    assert mock_get_http_session.return_value.get.call_count == 2
+
+    # A forced refresh always downloads
+    ensure_ca_bundle(bundle_path, force_refresh=True)
+    assert mock_get_http_session.return_value.get.call_count == 3
+
+
+# Test that the packaged bundle is used when the download fails
+@patch('utils.get_http_session')
+def test_ensure_ca_bundle_falls_back_to_packaged_bundle(mock_get_http_session, tmp_path):
+    from utils import ensure_ca_bundle
+    packaged_path = tmp_path / "packaged.pem"
+    packaged_path.write_bytes(b"-----BEGIN CERTIFICATE-----\n")
+    mock_get_http_session.return_value.get.side_effect = Exception("truststore unreachable")
+
+    with patch('utils.CA_PACKAGED_BUNDLE_PATH', str(packaged_path)):
+        assert ensure_ca_bundle(str(tmp_path / "missing.pem")) == str(packaged_path)
+
+
+# Test that the streaming MongoDB backup writes gzip NDJSON and a manifest with count and digest
+def test_stream_mongo_backup_to_s3_writes_ndjson_and_manifest():
+    import gzip
+    import hashlib
+    import json
+    from utils import stream_mongo_backup_to_s3
+    from digests import DatasetDigest
+    leads = [{"Email": "a@example.com", "Phone": "1"}, {"Email": "b@example.com", "Phone": "2"}]
+    mock_s3_client = MagicMock()
+
+    with patch('utils.get_leads_collection') as mock_get_leads_collection, \
+            patch('utils.s3_client', mock_s3_client), patch('s3_stream.s3_client', mock_s3_client), \
+            patch('utils.save_log_to_s3'):
+        mock_get_leads_collection.return_value.find.return_value = iter(leads)
+        manifest = stream_mongo_backup_to_s3(batch_size=500, backup_key="mongo-backup/test.ndjson.gz")
+
+    mock_get_leads_collection.return_value.find.assert_called_once_with(
+        {}, {"_id": 0, "_email_key": 0, "_content_hash": 0}, batch_size=500
+    )
+    uploads = {c.kwargs["Key"]: c.kwargs["Body"] for c in mock_s3_client.put_object.call_args_list}
+    ndjson = gzip.decompress(uploads["mongo-backup/test.ndjson.gz"])
+    assert [json.loads(line) for line in ndjson.splitlines()] == leads
+    assert manifest["record_count"] == 2
+    expected_digest = DatasetDigest()
+    expected_digest.update_many(leads)
+    assert DatasetDigest.from_dict(manifest) == expected_digest
+    assert manifest["sha256"] == hashlib.sha256(ndjson).hexdigest()
+    assert json.loads(uploads["mongo-backup/test.ndjson.gz.manifest.json"]) == manifest
+
+# Test that a JSON array backup is read element by element, even with elements split across reads
+def test_iter_backup_records_streams_json_array():
+    import io
+    from utils import iter_backup_records, iter_json_array
+    leads = [{"Email": "zoë@example.com", "Phone": "1", "Score": 12345}, {"Email": "b@example.com", "Tags": [1, 2]}, 7]
+    body = io.BytesIO(json.dumps(leads, ensure_ascii=False, indent=1).encode("utf-8"))
+
+    records = iter_json_array(body, chunk_size=3)
+    assert next(records) == leads[0]
+    assert body.tell() < len(body.getvalue())
+    assert list(records) == leads[1:]
+    assert list(iter_json_array(io.BytesIO(b" [ ] "), chunk_size=2)) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(b'[{"Email": "a@example.com"}'), chunk_size=4))
+
+    mock_s3_client = MagicMock()
+    mock_s3_client.get_object.return_value = {"Body": io.BytesIO(json.dumps(leads).encode("utf-8"))}
+    with patch('utils.s3_client', mock_s3_client):
+        assert list(iter_backup_records("zoho-backup/test.json")) == leads
+
+def test_reconcile_backups_compares_only_differing_buckets():
+    from utils import reconcile_backups_from_s3, find_field_discrepancies
+    from digests import BucketedDigest, email_bucket
+    zoho_leads = [{"Email": f"lead{i}@example.com", "Phone": str(i)} for i in range(50)]
+    mongo_leads = zoho_leads[:-1] + [{"Email": "lead49@example.com", "Phone": "changed"}]
+    manifests = {}
+    for key, leads in (("zoho.json", zoho_leads), ("mongo.json", mongo_leads)):
+        digest = BucketedDigest()
+        digest.update_many(leads)
+        manifests[key] = digest.to_dict()
+
+    with patch('utils.load_backup_manifest', side_effect=manifests.get), \
+            patch('utils.iter_backup_records', side_effect=lambda key: iter(zoho_leads if key == "zoho.json" else mongo_leads)), \
+            patch('utils.find_field_discrepancies', wraps=find_field_discrepancies) as mock_compare, \
+            patch('utils.s3_client'), patch('utils.save_log_to_s3'):
+        discrepancies = reconcile_backups_from_s3("zoho.json", "mongo.json")
+
+    zoho_data_dict = mock_compare.call_args.args[0]
+    assert {email_bucket(email) for email in zoho_data_dict} == {email_bucket("lead49@example.com")}
+    assert len(zoho_data_dict) < len(zoho_leads)
+    assert discrepancies == [{"Email": "lead49@example.com", "field": "Phone", "zoho_value": "49", "mongo_value": "changed"}]
+
+def test_validate_data_in_run_skips_s3_reads_when_digests_match():
+    from utils import validate_data
+    from digests import BucketedDigest
+    leads = [{"Email": f"lead{i}@example.com", "Phone": str(i)} for i in range(10)]
+    mongo_digest = BucketedDigest()
+    mongo_digest.update_many(reversed(leads))
+
+    with patch('utils.s3_client') as mock_s3_client, patch('utils.save_log_to_s3'), \
+            patch('utils.compare_backup_data_from_s3') as mock_full_compare:
+        discrepancies = validate_data(zoho_records=leads, mongo_manifest=mongo_digest.to_dict())
+
+    assert discrepancies == []
+    mock_s3_client.get_object.assert_not_called()
+    mock_full_compare.assert_not_called()
+
+# An incremental extract is only compared with the MongoDB documents of the leads it changed
+def test_validate_data_changed_only_compares_extracted_leads():
+    from utils import validate_data
+    changed = [{"Email": "A@example.com", "Phone": "1"}, {"Email": "b@example.com", "Phone": "2"}]
+    mock_collection = MagicMock()
+    mock_collection.find.return_value = [{"Email": "A@example.com", "Phone": "1"}, {"Email": "b@example.com", "Phone": "old"}]
+
+    with patch('utils.get_leads_collection', return_value=mock_collection), patch('utils.s3_client') as mock_s3_client, \
+            patch('utils.save_log_to_s3') as mock_save_log_to_s3, \
+            patch('utils.reconcile_backups_from_s3') as mock_reconcile:
+        discrepancies = validate_data(zoho_records=changed, changed_only=True, discrepancies_key="d.json")
+
+    assert discrepancies == [{"Email": "b@example.com", "field": "Phone", "zoho_value": "2", "mongo_value": "old"}]
+    assert mock_collection.find.call_args.args[0] == {"_email_key": {"$in": ["a@example.com", "b@example.com"]}}
+    mock_reconcile.assert_not_called()
+    mock_s3_client.get_object.assert_not_called()
+    assert mock_s3_client.put_object.call_args.kwargs["Key"] == "d.json"
+    assert mock_save_log_to_s3.call_args.kwargs["message"] == "Data mismatch found"
+
+# Digests built during the run are used as given; the records are not hashed again
+def test_reconcile_does_not_rehash_records_with_a_digest():
+    import utils
+    from digests import BucketedDigest
+    leads = [{"Email": "a@example.com"}]
+    digest = BucketedDigest()
+    digest.update_many(leads)
+
+    with patch('utils.save_log_to_s3'), patch('utils.s3_client'), \
+            patch('utils.index_records', wraps=utils.index_records) as mock_index:
+        discrepancies = utils.reconcile_backups_from_s3("zoho.json", "mongo.json", zoho_digest=digest,
+                                                        mongo_digest=digest, zoho_records=leads)
+
+    assert discrepancies == []
+    mock_index.assert_not_called()
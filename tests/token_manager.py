@@ -0,0 +1,70 @@
+import threading
+import time
+from constants import TOKEN_REFRESH_MARGIN
+
+class AccessTokenManager:
+    """
+    Caches an OAuth access token until shortly before it expires.
+
+    Concurrent callers share a single in-flight refresh. Once the token is inside the refresh
+    margin it is still handed out while a background thread fetches the next one, and a token
+    rejected with a 401 can be invalidated so the next caller refreshes it.
+
+    Parameters:
+        fetch_token (callable): Returns a tuple of (access_token, expires_in_seconds).
+        refresh_margin (int): Seconds before expiry at which a proactive refresh starts.
+        clock (callable): Monotonic clock, injectable for tests.
+    """
+
+    def __init__(self, fetch_token, refresh_margin=TOKEN_REFRESH_MARGIN, clock=time.monotonic):
+        self._fetch_token = fetch_token
+        self._refresh_margin = refresh_margin
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0
+        self._background_refresh = None
+
+    def get_token(self):
+        token, expires_at, now = self._token, self._expires_at, self._clock()
+        if token is not None and now < expires_at - self._refresh_margin:
+            return token
+        if token is not None and now < expires_at:
+            self._refresh_in_background(token)
+            return token
+        return self._refresh(token)
+
+    def _refresh(self, stale_token):
+        with self._lock:
+            # Another caller already replaced the token while this one waited for the lock
+            if self._token is not None and self._token != stale_token and self._clock() < self._expires_at:
+                return self._token
+            token, expires_in = self._fetch_token()
+            self._token, self._expires_at = token, self._clock() + expires_in
+            return token
+
+    def _refresh_in_background(self, stale_token):
+        with self._lock:
+            if self._background_refresh is not None and self._background_refresh.is_alive():
+                return
+            self._background_refresh = threading.Thread(
+                target=self._refresh_quietly, args=(stale_token,), name="zoho-token-refresh", daemon=True
+            )
+            self._background_refresh.start()
+
+    def _refresh_quietly(self, stale_token):
+        try:
+            self._refresh(stale_token)
+        except Exception as e:
+            # The current token is still valid; the next caller after expiry retries in the foreground
+            print(f"Background access token refresh failed: {e}")
+
+    def invalidate(self, token=None):
+        """
+        Drops the cached token, e.g. after Zoho answered 401. When `token` is given, the cache is
+        only cleared if it still holds that token, so many callers reporting the same rejected
+        token trigger one refresh.
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token, self._expires_at = None, 0
@@ -0,0 +1,79 @@
+from constants import ZOHO_API_BASE_URL, COLLECTION_NAME, EMAIL_KEY_FIELD, RECORD_KEY_FIELD
+from digests import normalize_email
+from s3_key_builders import build_module_backup_key
+
+# Zoho record IDs are matched as trimmed strings
+def normalize_record_id(record_id):
+    return "" if record_id is None else str(record_id).strip()
+
+class ZohoModule:
+    """
+    Extraction and load settings for one Zoho CRM module.
+
+    Parameters:
+        name (str): Zoho API name of the module, e.g. "Contacts".
+        fields (list): Fields requested from Zoho; Modified_Time is needed for incremental runs.
+        collection (str): DocumentDB collection the records are loaded into.
+        key_field (str): Zoho field identifying a record across runs.
+        key_store_field (str): Document field holding the normalized key, backed by a unique index.
+        normalize_key (callable): Turns a `key_field` value into the stored key; empty means unmatched.
+    """
+
+    def __init__(self, name, fields, collection, key_field="id", key_store_field=RECORD_KEY_FIELD,
+                 normalize_key=normalize_record_id):
+        self.name = name
+        self.fields = fields
+        self.collection = collection
+        self.key_field = key_field
+        self.key_store_field = key_store_field
+        self.normalize_key = normalize_key
+
+    @property
+    def url(self):
+        return f"{ZOHO_API_BASE_URL}/{self.name}"
+
+    def record_key(self, record):
+        return self.normalize_key(record.get(self.key_field))
+
+    def backup_key(self, date=None):
+        return build_module_backup_key(self.name, date)
+
+    def __repr__(self):
+        return f"ZohoModule({self.name!r}, collection={self.collection!r}, key_field={self.key_field!r})"
+
+ZOHO_MODULES = {
+    module.name: module for module in (
+        ZohoModule(
+            "Leads",
+            ["First_Name", "Last_Name", "Email", "Phone", "Company", "Industry", "Lead_Status", "Modified_Time"],
+            COLLECTION_NAME,
+            key_field="Email",
+            key_store_field=EMAIL_KEY_FIELD,
+            normalize_key=normalize_email
+        ),
+        ZohoModule(
+            "Contacts",
+            ["First_Name", "Last_Name", "Email", "Phone", "Account_Name", "Title", "Mailing_City", "Modified_Time"],
+            "contacts"
+        ),
+        ZohoModule(
+            "Accounts",
+            ["Account_Name", "Phone", "Website", "Industry", "Billing_City", "Billing_Country", "Modified_Time"],
+            "accounts"
+        ),
+        ZohoModule(
+            "Deals",
+            ["Deal_Name", "Stage", "Amount", "Closing_Date", "Account_Name", "Contact_Name", "Modified_Time"],
+            "deals"
+        ),
+    )
+}
+
+LEADS_MODULE = ZOHO_MODULES["Leads"]
+
+# Look up a module by its Zoho API name
+def get_zoho_module(name):
+    try:
+        return ZOHO_MODULES[name]
+    except KeyError:
+        raise ValueError(f"Unsupported Zoho module {name!r}; expected one of {', '.join(ZOHO_MODULES)}") from None